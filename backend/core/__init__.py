@@ -4,11 +4,29 @@ from .database import get_db, dict_from_row, init_db, DB_PATH
 from .security import (
     verify_password, 
     get_password_hash, 
+    verify_password_async,
+    get_password_hash_async,
+    verify_and_update_password,
     create_access_token, 
     decode_token,
+    revoke_token,
+    revoke_user_tokens,
+    load_user,
+    invalidate_principal,
+    get_user_from_token,
+    check_token_scope,
+    in_token_scope,
     get_current_user,
     get_current_admin_user,
     get_current_moderator_user,
     get_server_manager_user
 )
-from .websocket import ConnectionManager, chat_manager
+from .websocket import ClientConnection, ConnectionManager, chat_manager, encode_message, GLOBAL_CHANNEL
+from .bus import BroadcastBus, LocalBus, SQLiteBus, RedisBus, create_bus
+from .presence import PresenceTracker
+from .invalidation import Invalidations, invalidations
+from .cache import TTLCache
+from .batching import BatchWriter
+from .ratelimit import TokenBucketLimiter, login_ip_limiter, login_user_limiter
+from .metrics import Metrics, metrics
+from .api_tokens import generate_api_token, hash_api_token, lookup_api_token, invalidate_api_token, api_token_usage
@@ -0,0 +1,113 @@
+import hashlib
+import hmac
+import json
+import logging
+import secrets
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from .config import SECRET_KEY, API_TOKEN_CACHE_SIZE, API_TOKEN_CACHE_TTL
+from .database import get_db, dict_from_row
+from .cache import TTLCache
+from .invalidation import invalidations
+
+logger = logging.getLogger(__name__)
+
+# API tokens are told apart from JWTs by this prefix
+API_TOKEN_PREFIX = "peon_"
+
+# Token rows keyed by token hash; unknown hashes are cached briefly as misses
+api_token_cache = TTLCache(API_TOKEN_CACHE_SIZE, API_TOKEN_CACHE_TTL)
+_MISSING = object()
+_NEGATIVE_TTL = 5
+
+def generate_api_token() -> str:
+    """Generate a new plaintext API token"""
+    return API_TOKEN_PREFIX + secrets.token_urlsafe(32)
+
+def hash_api_token(token: str) -> str:
+    """Keyed hash of an API token (tokens are random, so no slow hash is needed)"""
+    return hmac.new(SECRET_KEY.encode(), token.encode(), hashlib.sha256).hexdigest()
+
+def is_api_token(token: str) -> bool:
+    """Check if a bearer credential is an API token rather than a JWT"""
+    return token.startswith(API_TOKEN_PREFIX)
+
+def lookup_api_token(token: str) -> Optional[dict]:
+    """Get the live token row for a plaintext API token, served from cache"""
+    token_hash = hash_api_token(token)
+    record = api_token_cache.get(token_hash, _MISSING)
+    if record is _MISSING:
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM api_tokens WHERE token_hash = ?", (token_hash,))
+        row = cursor.fetchone()
+        conn.close()
+
+        if row:
+            record = dict_from_row(row)
+            record['orchestrator_ids'] = json.loads(record['orchestrator_ids']) if record['orchestrator_ids'] else None
+            api_token_cache.set(token_hash, record)
+        else:
+            record = None
+            api_token_cache.set(token_hash, None, ttl=_NEGATIVE_TTL)
+
+    if record is None or record.get('revoked'):
+        return None
+    if record.get('expires_at') and record['expires_at'] <= datetime.now(timezone.utc).isoformat():
+        return None
+    return record
+
+def invalidate_api_token(token_hash: Optional[str] = None):
+    """Drop a cached token row on every worker after it changed (all if no hash given)"""
+    invalidations.invalidate('api_token', token_hash)
+
+def _drop_api_token(token_hash: Optional[str]):
+    if token_hash is None:
+        api_token_cache.clear()
+    else:
+        api_token_cache.pop(token_hash)
+
+invalidations.register('api_token', _drop_api_token)
+
+class TokenUsageTracker:
+    """Coalesces API token last-used timestamps into periodic batched writes"""
+
+    def __init__(self):
+        self._pending: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def mark(self, token_id: str):
+        """Record that a token was just used"""
+        now = datetime.now(timezone.utc).isoformat()
+        with self._lock:
+            self._pending[token_id] = now
+
+    def flush(self) -> int:
+        """Write pending last-used timestamps in one transaction"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        rows: List[tuple] = [(used_at, token_id) for token_id, used_at in pending.items()]
+        try:
+            conn = get_db()
+            conn.executemany("UPDATE api_tokens SET last_used_at = ? WHERE id = ?", rows)
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Failed to flush API token usage: {e}")
+            with self._lock:
+                for token_id, used_at in pending.items():
+                    self._pending.setdefault(token_id, used_at)
+            return 0
+        return len(rows)
+
+    def get(self, token_id: str) -> Optional[str]:
+        """Get a not yet flushed last-used timestamp"""
+        return self._pending.get(token_id)
+
+# Global usage tracker instance
+api_token_usage = TokenUsageTracker()
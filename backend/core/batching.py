@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import threading
+from typing import List, Optional
+
+from .database import get_db
+
+logger = logging.getLogger(__name__)
+
+class BatchWriter:
+    """Write-behind sink that batches queued rows into few transactions.
+
+    Rows are queued in memory and flushed by a background task every
+    ``flush_interval`` seconds or as soon as ``batch_size`` rows are
+    pending. With a ``linger`` the task instead wakes on the first queued
+    row and waits that long for more, so rows are group-committed within a
+    few milliseconds. Without a running task (scripts, startup seeding)
+    every row is written through immediately. Async readers that must see
+    queued rows await ``flush_async`` first.
+
+    Subclasses implement ``write`` to insert a batch on a connection.
+    """
+
+    # Used in log messages
+    name = 'rows'
+
+    def __init__(self, flush_interval: float, batch_size: int, linger: Optional[float] = None):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.linger = linger
+        self._pending: List[tuple] = []
+        self._lock = threading.Lock()
+        # Held for a whole flush, so a flush returns only once rows queued
+        # before it are committed, even if another flush had taken them
+        self._flush_lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def write(self, conn, batch: List[tuple]):
+        """Insert a batch inside the caller's transaction"""
+        raise NotImplementedError
+
+    def enqueue(self, entry: tuple):
+        """Queue a row for insertion"""
+        with self._lock:
+            self._pending.append(entry)
+            pending = len(self._pending)
+
+        if self._task is None:
+            self.flush()
+        elif pending >= self.batch_size or (self.linger is not None and pending == 1):
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def flush(self) -> int:
+        """Write all pending rows in a single transaction"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+
+            if not batch:
+                return 0
+
+            try:
+                conn = get_db()
+                try:
+                    self.write(conn, batch)
+                    conn.commit()
+                finally:
+                    conn.close()
+            except Exception as e:
+                # Put the batch back in front so nothing is lost or reordered
+                with self._lock:
+                    self._pending[:0] = batch
+                logger.error(f"Failed to flush {len(batch)} {self.name}: {e}")
+                return 0
+
+            return len(batch)
+
+    async def flush_async(self) -> int:
+        """Flush from async code without blocking the event loop on the write"""
+        return await asyncio.to_thread(self.flush)
+
+    def start(self):
+        """Start the background flush task on the running event loop"""
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background task and durably flush what is left"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush_async()
+
+    async def _run(self):
+        while True:
+            try:
+                async with asyncio.timeout(self.flush_interval):
+                    await self._wakeup.wait()
+            except TimeoutError:
+                pass
+            if self.linger and self._wakeup.is_set():
+                await asyncio.sleep(self.linger)
+            self._wakeup.clear()
+            await asyncio.to_thread(self.flush)
@@ -0,0 +1,237 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from typing import Callable, List, Optional
+
+from .config import BROADCAST_BUS, BUS_POLL_INTERVAL, BUS_RETENTION_SECONDS, REDIS_URL, REDIS_CHANNEL
+from .database import get_db
+
+logger = logging.getLogger(__name__)
+
+# Receives every envelope published on the bus, including this worker's own
+Handler = Callable[[dict], None]
+
+class BroadcastBus:
+    """Fans envelopes out to every worker process.
+
+    ``publish`` never blocks: the envelope is delivered to this worker's
+    handler straight away and shipped to other workers in the background.
+    Each envelope carries the ``origin`` of the worker that published it.
+    """
+
+    def __init__(self):
+        self.origin = uuid.uuid4().hex
+        self._handler: Optional[Handler] = None
+
+    def bind(self, handler: Handler):
+        """Set the handler envelopes are delivered to"""
+        self._handler = handler
+
+    async def start(self):
+        """Start exchanging envelopes with other workers"""
+
+    async def stop(self):
+        """Stop exchanging envelopes, shipping anything still queued first"""
+
+    def publish(self, envelope: dict):
+        """Deliver an envelope locally and queue it for other workers"""
+        envelope['origin'] = self.origin
+        self._deliver(envelope)
+
+    def _deliver(self, envelope: dict):
+        if self._handler is None:
+            return
+        try:
+            self._handler(envelope)
+        except Exception as e:
+            logger.error(f"Broadcast bus handler failed: {e}")
+
+class LocalBus(BroadcastBus):
+    """In-process bus for single-worker deployments"""
+
+class _OutboxBus(BroadcastBus):
+    """Bus that ships published envelopes to other workers from a background task"""
+
+    def __init__(self):
+        super().__init__()
+        self._outbox: List[dict] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def publish(self, envelope: dict):
+        super().publish(envelope)
+        if self._wakeup is not None:
+            self._outbox.append(envelope)
+            self._wakeup.set()
+
+    def _take_outbox(self) -> List[dict]:
+        batch, self._outbox = self._outbox, []
+        if self._wakeup is not None:
+            self._wakeup.clear()
+        return batch
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        batch = self._take_outbox()
+        if batch:
+            try:
+                await self._ship(batch)
+            except Exception as e:
+                logger.error(f"Failed to ship {len(batch)} broadcast(s) on shutdown: {e}")
+        self._wakeup = None
+
+    async def _ship(self, batch: List[dict]):
+        raise NotImplementedError
+
+class SQLiteBus(_OutboxBus):
+    """Cross-worker bus over the shared database.
+
+    Published envelopes are appended to ``bus_events`` in batches; every
+    worker polls for rows newer than the last one it has seen. Old rows
+    are pruned after ``BUS_RETENTION_SECONDS``.
+    """
+
+    def __init__(self, poll_interval: float = BUS_POLL_INTERVAL, retention: float = BUS_RETENTION_SECONDS):
+        super().__init__()
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._last_id = 0
+
+    async def start(self):
+        self._last_id = await asyncio.to_thread(self._max_id)
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._run())]
+
+    @staticmethod
+    def _max_id() -> int:
+        conn = get_db()
+        row = conn.execute("SELECT COALESCE(MAX(id), 0) FROM bus_events").fetchone()
+        conn.close()
+        return row[0]
+
+    async def _run(self):
+        last_prune = time.monotonic()
+        while True:
+            try:
+                async with asyncio.timeout(self.poll_interval):
+                    await self._wakeup.wait()
+            except TimeoutError:
+                pass
+            try:
+                batch = self._take_outbox()
+                if batch:
+                    await self._ship(batch)
+                prune = time.monotonic() - last_prune >= self.retention
+                if prune:
+                    last_prune = time.monotonic()
+                for envelope in await asyncio.to_thread(self._poll, prune):
+                    self._deliver(envelope)
+            except Exception as e:
+                logger.error(f"Broadcast bus poll failed: {e}")
+                await asyncio.sleep(self.poll_interval)
+
+    async def _ship(self, batch: List[dict]):
+        rows = [(envelope['origin'], json.dumps(envelope), time.time()) for envelope in batch]
+
+        def insert():
+            conn = get_db()
+            conn.executemany("INSERT INTO bus_events (origin, payload, created_at) VALUES (?, ?, ?)", rows)
+            conn.commit()
+            conn.close()
+
+        await asyncio.to_thread(insert)
+
+    def _poll(self, prune: bool) -> List[dict]:
+        """Read envelopes other workers published since the last poll"""
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT id, origin, payload FROM bus_events WHERE id > ? ORDER BY id",
+            (self._last_id,)
+        )
+        rows = cursor.fetchall()
+        if prune:
+            cursor.execute("DELETE FROM bus_events WHERE created_at < ?", (time.time() - self.retention,))
+            conn.commit()
+        conn.close()
+
+        if rows:
+            self._last_id = rows[-1][0]
+        return [json.loads(payload) for _, origin, payload in rows if origin != self.origin]
+
+class RedisBus(_OutboxBus):
+    """Cross-worker bus over Redis pub/sub (requires the ``redis`` package)"""
+
+    def __init__(self, url: str = REDIS_URL, channel: str = REDIS_CHANNEL):
+        super().__init__()
+        self.url = url
+        self.channel = channel
+        self._redis = None
+
+    async def start(self):
+        try:
+            import redis.asyncio as aioredis
+        except ImportError:
+            raise RuntimeError("BROADCAST_BUS=redis requires the 'redis' package")
+
+        self._redis = aioredis.from_url(self.url)
+        pubsub = self._redis.pubsub()
+        await pubsub.subscribe(self.channel)
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._listen(pubsub)), asyncio.create_task(self._publish_loop())]
+
+    async def stop(self):
+        await super().stop()
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+    async def _listen(self, pubsub):
+        while True:
+            try:
+                async for item in pubsub.listen():
+                    if item.get('type') != 'message':
+                        continue
+                    envelope = json.loads(item['data'])
+                    if envelope.get('origin') != self.origin:
+                        self._deliver(envelope)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Redis bus subscription failed: {e}")
+                await asyncio.sleep(1)
+
+    async def _publish_loop(self):
+        while True:
+            await self._wakeup.wait()
+            batch = self._take_outbox()
+            try:
+                await self._ship(batch)
+            except Exception as e:
+                logger.error(f"Redis bus publish failed: {e}")
+                await asyncio.sleep(1)
+
+    async def _ship(self, batch: List[dict]):
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for envelope in batch:
+                pipe.publish(self.channel, json.dumps(envelope))
+            await pipe.execute()
+
+def create_bus(kind: str = BROADCAST_BUS) -> BroadcastBus:
+    """Create the configured bus: local, sqlite or redis"""
+    if kind == 'sqlite':
+        return SQLiteBus()
+    if kind == 'redis':
+        return RedisBus()
+    if kind != 'local':
+        logger.warning(f"Unknown BROADCAST_BUS '{kind}', using local")
+    return LocalBus()
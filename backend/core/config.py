@@ -12,9 +12,104 @@ SECRET_KEY = os.environ.get('SECRET_KEY', 'your-secret-key-change-in-production'
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 hours
 
+# Password hashing: bcrypt cost factor (stored hashes with a different cost
+# are rehashed on the next successful login) and the number of worker
+# threads hashing runs on, so it never blocks the event loop
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', '12'))
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', str(min(4, os.cpu_count() or 1))))
+
+# Bulk user import: hashing runs across a process pool of this many workers,
+# and rows are inserted this many per transaction
+USER_IMPORT_WORKERS = int(os.environ.get('USER_IMPORT_WORKERS', str(os.cpu_count() or 1)))
+USER_IMPORT_BATCH_SIZE = int(os.environ.get('USER_IMPORT_BATCH_SIZE', '100'))
+
+# Login throttling (token buckets): every attempt spends a token from the
+# client IP's bucket, failed attempts also from the username's bucket
+LOGIN_RATE_IP_BURST = int(os.environ.get('LOGIN_RATE_IP_BURST', '120'))
+LOGIN_RATE_IP_PER_MINUTE = float(os.environ.get('LOGIN_RATE_IP_PER_MINUTE', '120'))
+LOGIN_RATE_USER_BURST = int(os.environ.get('LOGIN_RATE_USER_BURST', '10'))
+LOGIN_RATE_USER_PER_MINUTE = float(os.environ.get('LOGIN_RATE_USER_PER_MINUTE', '5'))
+RATE_LIMIT_MAX_KEYS = int(os.environ.get('RATE_LIMIT_MAX_KEYS', '10000'))
+
+# Authenticated-principal cache (user rows keyed by id); entries are
+# invalidated on user changes and expire after the TTL (seconds) regardless
+PRINCIPAL_CACHE_TTL = float(os.environ.get('PRINCIPAL_CACHE_TTL', '60'))
+PRINCIPAL_CACHE_SIZE = int(os.environ.get('PRINCIPAL_CACHE_SIZE', '1024'))
+
+# Verified-token cache: sha256(token) -> claims, kept until the token expires
+TOKEN_CACHE_SIZE = int(os.environ.get('TOKEN_CACHE_SIZE', '4096'))
+
+# API tokens: cached token rows (seconds) and how often coalesced last-used
+# timestamps are written back
+API_TOKEN_CACHE_SIZE = int(os.environ.get('API_TOKEN_CACHE_SIZE', '1024'))
+API_TOKEN_CACHE_TTL = float(os.environ.get('API_TOKEN_CACHE_TTL', '300'))
+API_TOKEN_USAGE_FLUSH_INTERVAL = float(os.environ.get('API_TOKEN_USAGE_FLUSH_INTERVAL', '30'))
+
+# Per-user visible server lists cached per shared snapshot version
+SERVER_VISIBILITY_CACHE_SIZE = int(os.environ.get('SERVER_VISIBILITY_CACHE_SIZE', '2048'))
+
+# Server lists are served from the shared snapshot until it is this old
+# (seconds), then fetched live from the orchestrator again
+SERVER_SNAPSHOT_MAX_AGE = float(os.environ.get('SERVER_SNAPSHOT_MAX_AGE', '10'))
+
+# WebSocket fan-out: messages queued per connection before a client counts
+# as too slow and is dropped, and how long a single send may take (seconds)
+WS_SEND_QUEUE_SIZE = int(os.environ.get('WS_SEND_QUEUE_SIZE', '256'))
+WS_SEND_TIMEOUT = float(os.environ.get('WS_SEND_TIMEOUT', '10'))
+
+# WebSocket liveness (seconds): chat and console clients are pinged every
+# interval and closed if nothing (not even a pong) arrives within the pong
+# timeout after a ping, or if they send nothing but pongs for the idle
+# timeout. 0 disables pings or the idle timeout
+WS_PING_INTERVAL = float(os.environ.get('WS_PING_INTERVAL', '25'))
+WS_PONG_TIMEOUT = float(os.environ.get('WS_PONG_TIMEOUT', '20'))
+WS_IDLE_TIMEOUT = float(os.environ.get('WS_IDLE_TIMEOUT', '3600'))
+
+# Broadcast bus carrying chat and presence events between worker processes:
+# 'local' (single worker), 'sqlite' (shared database, polled) or 'redis'
+BROADCAST_BUS = os.environ.get('BROADCAST_BUS', 'local').lower()
+BUS_POLL_INTERVAL = float(os.environ.get('BUS_POLL_INTERVAL', '0.05'))
+BUS_RETENTION_SECONDS = float(os.environ.get('BUS_RETENTION_SECONDS', '60'))
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+REDIS_CHANNEL = os.environ.get('REDIS_CHANNEL', 'peon:broadcast')
+
+# Chat group commit: messages are written in one transaction per linger
+# window (seconds), or sooner once the batch size is reached; the interval
+# bounds how long the writer sleeps between checks
+CHAT_FLUSH_INTERVAL = float(os.environ.get('CHAT_FLUSH_INTERVAL', '1.0'))
+CHAT_FLUSH_LINGER = float(os.environ.get('CHAT_FLUSH_LINGER', '0.005'))
+CHAT_FLUSH_BATCH_SIZE = int(os.environ.get('CHAT_FLUSH_BATCH_SIZE', '200'))
+
+# Newest chat messages kept in memory for history on connect and first pages
+CHAT_HISTORY_SIZE = int(os.environ.get('CHAT_HISTORY_SIZE', '500'))
+
+# Presence: each worker heartbeats its connected users every interval
+# (seconds) and writes their last_seen to online_users; users whose worker
+# misses heartbeats for the timeout go offline. Changes are pushed to
+# clients as diffs coalesced over the delay
+PRESENCE_HEARTBEAT_INTERVAL = float(os.environ.get('PRESENCE_HEARTBEAT_INTERVAL', '30'))
+PRESENCE_TIMEOUT = float(os.environ.get('PRESENCE_TIMEOUT', '90'))
+PRESENCE_DIFF_DELAY = float(os.environ.get('PRESENCE_DIFF_DELAY', '0.5'))
+
 # Background sync interval (5 minutes)
 SYNC_INTERVAL = 300
 
+# Audit write-behind: pending entries are flushed every interval (seconds)
+# or as soon as the batch size is reached, whichever comes first
+AUDIT_FLUSH_INTERVAL = float(os.environ.get('AUDIT_FLUSH_INTERVAL', '1.0'))
+AUDIT_FLUSH_BATCH_SIZE = int(os.environ.get('AUDIT_FLUSH_BATCH_SIZE', '200'))
+
+# Retention engine: how often policies run (seconds), how many rows are
+# archived/deleted per transaction, and where compressed archives are written
+# (next to the database by default so they land on the same volume)
+RETENTION_INTERVAL = int(os.environ.get('RETENTION_INTERVAL', '3600'))
+RETENTION_BATCH_SIZE = int(os.environ.get('RETENTION_BATCH_SIZE', '500'))
+RETENTION_VACUUM_PAGES = int(os.environ.get('RETENTION_VACUUM_PAGES', '1000'))
+ARCHIVE_DIR = Path(os.environ.get(
+    'ARCHIVE_DIR',
+    str(Path(os.environ.get('DATABASE_PATH', str(ROOT_DIR / 'peon.db'))).parent / 'archives')
+))
+
 # CORS settings
 CORS_ORIGINS = os.environ.get('CORS_ORIGINS', '*').split(',')
 
@@ -26,6 +121,12 @@ DEFAULT_FEATURES = {
     'server_stats': True,
 }
 
+# Retention policies (stored in DB, defaults here)
+DEFAULT_RETENTION = {
+    'chat_messages': {'enabled': False, 'days': 90, 'archive': True},
+    'audit_log': {'enabled': False, 'days': 365, 'archive': True},
+}
+
 # Role permissions
 ROLE_PERMISSIONS = {
     'admin': {
@@ -81,7 +182,41 @@ class Settings:
     SECRET_KEY = SECRET_KEY
     ALGORITHM = ALGORITHM
     ACCESS_TOKEN_EXPIRE_MINUTES = ACCESS_TOKEN_EXPIRE_MINUTES
+    BCRYPT_ROUNDS = BCRYPT_ROUNDS
+    PASSWORD_HASH_WORKERS = PASSWORD_HASH_WORKERS
+    USER_IMPORT_WORKERS = USER_IMPORT_WORKERS
+    USER_IMPORT_BATCH_SIZE = USER_IMPORT_BATCH_SIZE
+    WS_SEND_QUEUE_SIZE = WS_SEND_QUEUE_SIZE
+    WS_SEND_TIMEOUT = WS_SEND_TIMEOUT
+    WS_PING_INTERVAL = WS_PING_INTERVAL
+    WS_PONG_TIMEOUT = WS_PONG_TIMEOUT
+    WS_IDLE_TIMEOUT = WS_IDLE_TIMEOUT
+    BROADCAST_BUS = BROADCAST_BUS
+    BUS_POLL_INTERVAL = BUS_POLL_INTERVAL
+    BUS_RETENTION_SECONDS = BUS_RETENTION_SECONDS
+    REDIS_URL = REDIS_URL
+    REDIS_CHANNEL = REDIS_CHANNEL
+    CHAT_FLUSH_INTERVAL = CHAT_FLUSH_INTERVAL
+    CHAT_FLUSH_LINGER = CHAT_FLUSH_LINGER
+    CHAT_FLUSH_BATCH_SIZE = CHAT_FLUSH_BATCH_SIZE
+    CHAT_HISTORY_SIZE = CHAT_HISTORY_SIZE
+    PRESENCE_HEARTBEAT_INTERVAL = PRESENCE_HEARTBEAT_INTERVAL
+    PRESENCE_TIMEOUT = PRESENCE_TIMEOUT
+    PRESENCE_DIFF_DELAY = PRESENCE_DIFF_DELAY
+    TOKEN_CACHE_SIZE = TOKEN_CACHE_SIZE
+    API_TOKEN_CACHE_TTL = API_TOKEN_CACHE_TTL
+    SERVER_SNAPSHOT_MAX_AGE = SERVER_SNAPSHOT_MAX_AGE
+    API_TOKEN_USAGE_FLUSH_INTERVAL = API_TOKEN_USAGE_FLUSH_INTERVAL
+    LOGIN_RATE_IP_BURST = LOGIN_RATE_IP_BURST
+    LOGIN_RATE_IP_PER_MINUTE = LOGIN_RATE_IP_PER_MINUTE
+    LOGIN_RATE_USER_BURST = LOGIN_RATE_USER_BURST
+    LOGIN_RATE_USER_PER_MINUTE = LOGIN_RATE_USER_PER_MINUTE
     SYNC_INTERVAL = SYNC_INTERVAL
+    AUDIT_FLUSH_INTERVAL = AUDIT_FLUSH_INTERVAL
+    AUDIT_FLUSH_BATCH_SIZE = AUDIT_FLUSH_BATCH_SIZE
+    RETENTION_INTERVAL = RETENTION_INTERVAL
+    RETENTION_BATCH_SIZE = RETENTION_BATCH_SIZE
+    ARCHIVE_DIR = ARCHIVE_DIR
     CORS_ORIGINS = CORS_ORIGINS
     ROOT_DIR = ROOT_DIR
     
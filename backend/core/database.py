@@ -1,7 +1,10 @@
+import logging
 import sqlite3
 import os
 from pathlib import Path
 
+logger = logging.getLogger(__name__)
+
 ROOT_DIR = Path(__file__).parent.parent
 
 # Use DATABASE_PATH environment variable if set (for containers)
@@ -28,6 +31,16 @@ def init_db():
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     
+    # Incremental auto-vacuum lets retention runs hand freed pages back to the
+    # filesystem. It can only be set before the first table is created;
+    # existing databases switch with POST /api/admin/database/vacuum, which
+    # rewrites the whole file and so is never run at startup.
+    cursor.execute("SELECT COUNT(*) FROM sqlite_master")
+    if cursor.fetchone()[0] == 0:
+        cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    elif cursor.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        logger.warning("Incremental auto-vacuum is not enabled; run POST /api/admin/database/vacuum once to enable it")
+    
     # Users table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS users (
@@ -165,6 +178,67 @@ def init_db():
         )
     ''')
     
+    # Audit counters per category, per day and all-time (day = '')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS audit_counters (
+            category TEXT NOT NULL,
+            day TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (category, day)
+        )
+    ''')
+    
+    # Individually revoked access tokens (sha256 digests) until they expire
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS revoked_tokens (
+            token_hash TEXT PRIMARY KEY,
+            user_id TEXT,
+            expires_at REAL NOT NULL
+        )
+    ''')
+    
+    # API tokens for automation: only an HMAC of the token is stored; role and
+    # orchestrator_ids (JSON list) optionally narrow what the token may do
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS api_tokens (
+            id TEXT PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            name TEXT NOT NULL,
+            token_prefix TEXT NOT NULL,
+            token_hash TEXT UNIQUE NOT NULL,
+            role TEXT,
+            orchestrator_ids TEXT,
+            created_at TEXT NOT NULL,
+            expires_at TEXT,
+            last_used_at TEXT,
+            revoked INTEGER DEFAULT 0,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_api_tokens_user ON api_tokens(user_id)")
+    
+    # Cross-worker broadcast bus (BROADCAST_BUS=sqlite): short-lived rows
+    # that every worker polls by id
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS bus_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            origin TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            created_at REAL NOT NULL
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_bus_events_created ON bus_events(created_at)")
+    
+    # Seed counters once for databases that predate them
+    cursor.execute("SELECT EXISTS (SELECT 1 FROM audit_counters)")
+    if not cursor.fetchone()[0]:
+        cursor.execute('''
+            INSERT INTO audit_counters (category, day, count)
+            SELECT category, substr(created_at, 1, 10), COUNT(*) FROM audit_log GROUP BY 1, 2
+            UNION ALL
+            SELECT category, '', COUNT(*) FROM audit_log GROUP BY 1
+        ''')
+    
     # Online users tracking table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS online_users (
@@ -175,11 +249,101 @@ def init_db():
         )
     ''')
     
+    # Indexes for time-ordered scans (retention, history paging)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_chat_messages_created ON chat_messages(created_at, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_audit_log_created ON audit_log(created_at, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_audit_log_category_created ON audit_log(category, created_at, id)")
+    
     # Add new columns to existing tables if they don't exist
     try:
         cursor.execute("ALTER TABLE users ADD COLUMN is_chat_banned INTEGER DEFAULT 0")
     except sqlite3.OperationalError:
         pass  # Column already exists
     
+    # Chat channel: 'global', 'orch:<orchestrator id>' or 'session:<gaming session id>'
+    try:
+        cursor.execute("ALTER TABLE chat_messages ADD COLUMN channel TEXT NOT NULL DEFAULT 'global'")
+    except sqlite3.OperationalError:
+        pass  # Column already exists
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_chat_messages_channel_created ON chat_messages(channel, created_at, id)")
+    
+    # Stable integer key for the search index. The implicit rowid of a table
+    # with a TEXT primary key may be renumbered by VACUUM or a dump/reload;
+    # seq is a real column, so it survives both. The chat writer assigns it.
+    try:
+        cursor.execute("ALTER TABLE chat_messages ADD COLUMN seq INTEGER")
+    except sqlite3.OperationalError:
+        pass  # Column already exists
+    cursor.execute("UPDATE chat_messages SET seq = rowid WHERE seq IS NULL")
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_chat_messages_seq ON chat_messages(seq)")
+    
+    # Full-text index over chat messages (external content, keyed by seq)
+    # kept in sync by triggers. An index keyed by the old rowid is replaced.
+    cursor.execute("SELECT sql FROM sqlite_master WHERE name = 'chat_messages_fts'")
+    row = cursor.fetchone()
+    fts_current = row is not None and "content_rowid='seq'" in row[0]
+    if row is not None and not fts_current:
+        for trigger in ('insert', 'delete', 'update'):
+            cursor.execute(f"DROP TRIGGER IF EXISTS chat_messages_fts_{trigger}")
+        cursor.execute("DROP TABLE chat_messages_fts")
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS chat_messages_fts
+        USING fts5(message, content='chat_messages', content_rowid='seq')
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS chat_messages_fts_insert AFTER INSERT ON chat_messages BEGIN
+            INSERT INTO chat_messages_fts (rowid, message) VALUES (new.seq, new.message);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS chat_messages_fts_delete AFTER DELETE ON chat_messages BEGIN
+            INSERT INTO chat_messages_fts (chat_messages_fts, rowid, message) VALUES ('delete', old.seq, old.message);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS chat_messages_fts_update AFTER UPDATE OF message ON chat_messages BEGIN
+            INSERT INTO chat_messages_fts (chat_messages_fts, rowid, message) VALUES ('delete', old.seq, old.message);
+            INSERT INTO chat_messages_fts (rowid, message) VALUES (new.seq, new.message);
+        END
+    ''')
+    if not fts_current:
+        cursor.execute("INSERT INTO chat_messages_fts (chat_messages_fts) VALUES ('rebuild')")
+    
+    # Tokens issued (iat) before this epoch time are revoked
+    try:
+        cursor.execute("ALTER TABLE users ADD COLUMN tokens_valid_after REAL DEFAULT 0")
+    except sqlite3.OperationalError:
+        pass  # Column already exists
+    
+    # Cached server fields projected out of server_data so they can be indexed
+    for column, column_type in [
+        ('game_uid', 'TEXT'),
+        ('servername', 'TEXT'),
+        ('container_state', 'TEXT'),
+        ('players', 'INTEGER'),
+        ('version', 'TEXT'),
+    ]:
+        try:
+            cursor.execute(f"ALTER TABLE cached_servers ADD COLUMN {column} {column_type}")
+        except sqlite3.OperationalError:
+            pass  # Column already exists
+    
+    # Backfill projections for rows cached before the columns existed
+    cursor.execute('''
+        UPDATE cached_servers SET
+            game_uid = json_extract(server_data, '$.game_uid'),
+            servername = json_extract(server_data, '$.servername'),
+            container_state = json_extract(server_data, '$.container_state'),
+            players = CAST(COALESCE(json_extract(server_data, '$.players'),
+                                    json_extract(server_data, '$.server_config.players')) AS INTEGER),
+            version = COALESCE(json_extract(server_data, '$.version'),
+                               json_extract(server_data, '$.server_config.version'))
+        WHERE game_uid IS NULL
+    ''')
+    
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_cached_servers_game_state ON cached_servers(game_uid, container_state)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_cached_servers_state ON cached_servers(container_state)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_cached_servers_servername ON cached_servers(servername)")
+    
     conn.commit()
     conn.close()
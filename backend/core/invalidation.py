@@ -0,0 +1,48 @@
+import logging
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Applies one invalidation to this worker's in-memory state
+Applier = Callable[[Any], None]
+
+class Invalidations:
+    """Keeps per-worker caches and security state in step across workers.
+
+    Each kind of state registers an applier under a name. ``invalidate``
+    applies a change in this worker and announces it on the broadcast bus,
+    where every other worker applies it too. Keys must be JSON-serialisable.
+    """
+
+    def __init__(self):
+        self._appliers: Dict[str, Applier] = {}
+        self._publish: Optional[Callable[[dict], None]] = None
+
+    def register(self, name: str, applier: Applier):
+        """Set the function that applies invalidations of this name locally"""
+        self._appliers[name] = applier
+
+    def bind(self, publish: Optional[Callable[[dict], None]]):
+        """Set where announcements are published (None to keep them local)"""
+        self._publish = publish
+
+    def invalidate(self, name: str, key: Any = None):
+        """Apply an invalidation here, then announce it to other workers"""
+        self.apply(name, key)
+        self.announce(name, key)
+
+    def announce(self, name: str, key: Any = None):
+        """Tell other workers to apply an invalidation already applied here"""
+        if self._publish is not None:
+            self._publish({"type": "invalidate", "name": name, "key": key})
+
+    def apply(self, name: str, key: Any = None):
+        """Apply an invalidation to this worker only"""
+        applier = self._appliers.get(name)
+        if applier is None:
+            logger.warning(f"No applier registered for invalidation '{name}'")
+            return
+        applier(key)
+
+# Global invalidation registry
+invalidations = Invalidations()
@@ -0,0 +1,27 @@
+import threading
+from collections import defaultdict
+from typing import Dict
+
+class Metrics:
+    """Process-local counters for operational events"""
+
+    def __init__(self):
+        self._counters: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: int = 1):
+        """Increment a counter"""
+        with self._lock:
+            self._counters[name] += value
+
+    def get(self, name: str) -> int:
+        """Get the current value of a counter"""
+        return self._counters.get(name, 0)
+
+    def snapshot(self) -> Dict[str, int]:
+        """Get a copy of all counters"""
+        with self._lock:
+            return dict(self._counters)
+
+# Global metrics registry
+metrics = Metrics()
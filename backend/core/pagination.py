@@ -0,0 +1,78 @@
+"""
+Keyset pagination helpers
+Opaque cursors over (created_at, id) so that deep pages cost the same as the first one
+"""
+import base64
+import json
+from typing import Optional, List, Tuple
+from fastapi import HTTPException
+
+DIRECTIONS = ('next', 'prev')
+
+def encode_cursor(created_at: str, row_id: str) -> str:
+    """Encode a (created_at, id) position as an opaque URL-safe cursor"""
+    raw = json.dumps([created_at, row_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """Decode an opaque cursor back into its (created_at, id) position"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return str(created_at), str(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def keyset_clause(
+    cursor: Optional[str],
+    direction: str,
+    created_col: str = 'created_at',
+    id_col: str = 'id'
+) -> Tuple[str, list, str]:
+    """Build the WHERE fragment, params and ORDER BY for a newest-first keyset page.
+
+    'next' walks towards older rows, 'prev' towards newer ones. Rows for a
+    'prev' page come back oldest-first and are flipped by ``build_page``.
+    """
+    if direction not in DIRECTIONS:
+        raise HTTPException(status_code=400, detail="Invalid direction")
+
+    if direction == 'next':
+        order = f"{created_col} DESC, {id_col} DESC"
+        comparison = '<'
+    else:
+        order = f"{created_col} ASC, {id_col} ASC"
+        comparison = '>'
+
+    if not cursor:
+        return "", [], order
+
+    created_at, row_id = decode_cursor(cursor)
+    return f"({created_col}, {id_col}) {comparison} (?, ?)", [created_at, row_id], order
+
+def build_page(
+    rows: List[dict],
+    limit: int,
+    cursor: Optional[str],
+    direction: str
+) -> Tuple[List[dict], Optional[str], Optional[str]]:
+    """Trim a limit+1 fetch to a newest-first page and compute neighbour cursors"""
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if direction == 'prev':
+        rows.reverse()
+
+    if not rows:
+        return rows, None, None
+
+    first = encode_cursor(rows[0]['created_at'], rows[0]['id'])
+    last = encode_cursor(rows[-1]['created_at'], rows[-1]['id'])
+
+    if direction == 'next':
+        next_cursor = last if has_more else None
+        prev_cursor = first if cursor else None
+    else:
+        next_cursor = last
+        prev_cursor = first if has_more else None
+
+    return rows, next_cursor, prev_cursor
@@ -0,0 +1,134 @@
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+from .config import PRESENCE_TIMEOUT
+from .database import get_db
+
+
+class PresenceTracker:
+    """In-memory set of online users across workers, kept alive by heartbeats.
+
+    Each worker holding connections for a user is one session of that user;
+    a session lasts until the worker releases it or stops sending heartbeats
+    for ``timeout`` seconds. Changes are collected into a diff until taken,
+    and ``flush`` writes last_seen back to ``online_users`` in one transaction.
+    """
+
+    def __init__(self, timeout: float = PRESENCE_TIMEOUT):
+        self.timeout = timeout
+        self._sessions: Dict[str, Dict[str, float]] = {}  # user_id -> origin -> last heartbeat
+        self._users: Dict[str, dict] = {}  # user_id -> {id, username, role}
+        self._joined: Dict[str, dict] = {}
+        self._left: set = set()
+        self._gone: set = set()  # went offline since the last flush
+        self._lock = threading.Lock()
+
+    def join(self, user: dict, origin: str):
+        """Start (or refresh) a user's session on a worker"""
+        with self._lock:
+            self._join(user, origin, time.time())
+
+    def _join(self, user: dict, origin: str, now: float):
+        sessions = self._sessions.setdefault(user['id'], {})
+        first = not sessions
+        sessions[origin] = now
+        self._users[user['id']] = user
+        if first:
+            if user['id'] in self._left:
+                self._left.discard(user['id'])
+            else:
+                self._joined[user['id']] = user
+
+    def leave(self, user_id: str, origin: str):
+        """End a user's session on a worker"""
+        with self._lock:
+            self._leave(user_id, origin)
+
+    def _leave(self, user_id: str, origin: str):
+        sessions = self._sessions.get(user_id)
+        if not sessions or origin not in sessions:
+            return
+        del sessions[origin]
+        if sessions:
+            return
+        del self._sessions[user_id]
+        del self._users[user_id]
+        self._gone.add(user_id)
+        if self._joined.pop(user_id, None) is None:
+            self._left.add(user_id)
+
+    def heartbeat(self, users: Iterable[dict], origin: str):
+        """Refresh every session a worker reports, restoring any that were missed"""
+        now = time.time()
+        with self._lock:
+            for user in users:
+                self._join(user, origin, now)
+
+    def release_origin(self, origin: str):
+        """End every session of a worker that stopped"""
+        with self._lock:
+            for user_id in [u for u, sessions in self._sessions.items() if origin in sessions]:
+                self._leave(user_id, origin)
+
+    def expire(self) -> int:
+        """End sessions whose worker missed its heartbeats"""
+        cutoff = time.time() - self.timeout
+        with self._lock:
+            stale = [
+                (user_id, origin)
+                for user_id, sessions in self._sessions.items()
+                for origin, last in sessions.items()
+                if last < cutoff
+            ]
+            for user_id, origin in stale:
+                self._leave(user_id, origin)
+        return len(stale)
+
+    def rename(self, user_id: str, username: str):
+        """Show a user's new name in the online list"""
+        with self._lock:
+            if user_id in self._users:
+                self._users[user_id] = {**self._users[user_id], 'username': username}
+
+    def is_online(self, user_id: str) -> bool:
+        """Check if a user has a session on any worker"""
+        return user_id in self._sessions
+
+    def online_users(self) -> List[dict]:
+        """Get the online users with their usernames and roles"""
+        with self._lock:
+            return list(self._users.values())
+
+    def take_diff(self) -> Optional[dict]:
+        """Get and reset the changes since the last diff, or None if there are none"""
+        with self._lock:
+            if not self._joined and not self._left:
+                return None
+            diff = {"online": list(self._joined.values()), "offline": list(self._left)}
+            self._joined, self._left = {}, set()
+        return diff
+
+    def flush(self, local_users: Iterable[dict]) -> int:
+        """Write this worker's users' last_seen and drop rows of offline users"""
+        with self._lock:
+            gone = [(user_id,) for user_id in self._gone if user_id not in self._sessions]
+            self._gone = set()
+        now = datetime.now(timezone.utc)
+        rows = [(user['id'], user['username'], now.isoformat()) for user in local_users]
+        cutoff = datetime.fromtimestamp(now.timestamp() - self.timeout, timezone.utc).isoformat()
+
+        conn = get_db()
+        try:
+            conn.executemany('''
+                INSERT INTO online_users (user_id, username, last_seen) VALUES (?, ?, ?)
+                ON CONFLICT(user_id) DO UPDATE SET username = excluded.username, last_seen = excluded.last_seen
+            ''', rows)
+            conn.executemany("DELETE FROM online_users WHERE user_id = ?", gone)
+            # Rows not refreshed by any worker within the timeout are stale
+            conn.execute("DELETE FROM online_users WHERE last_seen < ?", (cutoff,))
+            conn.commit()
+        finally:
+            conn.close()
+        return len(rows)
@@ -0,0 +1,86 @@
+import threading
+import time
+from typing import Dict, Hashable, List
+
+from .config import (
+    LOGIN_RATE_IP_BURST, LOGIN_RATE_IP_PER_MINUTE,
+    LOGIN_RATE_USER_BURST, LOGIN_RATE_USER_PER_MINUTE, RATE_LIMIT_MAX_KEYS
+)
+
+class TokenBucketLimiter:
+    """In-memory token buckets keyed by an arbitrary hashable (IP, username, ...).
+
+    Each key holds `capacity` tokens that refill continuously at `rate` tokens
+    per second. A bucket that has refilled completely is indistinguishable
+    from a missing one, so idle buckets are swept periodically and the map
+    only ever holds keys that spent tokens recently.
+    """
+
+    def __init__(self, capacity: float, rate: float, max_keys: int = 10000, sweep_interval: float = 60.0):
+        self.capacity = float(capacity)
+        self.rate = float(rate)
+        self.max_keys = max_keys
+        self.sweep_interval = sweep_interval
+        self._buckets: Dict[Hashable, List[float]] = {}  # key -> [tokens, updated_at]
+        self._lock = threading.Lock()
+        self._next_sweep = time.monotonic() + sweep_interval
+
+    def _refill(self, key: Hashable, now: float) -> List[float]:
+        bucket = self._buckets.pop(key, None)
+        if bucket is None:
+            bucket = [self.capacity, now]
+        else:
+            bucket[0] = min(self.capacity, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        # Re-insert so dict order doubles as least-recently-used order
+        self._buckets[key] = bucket
+        return bucket
+
+    def _wait_time(self, tokens: float) -> float:
+        if tokens >= 1:
+            return 0.0
+        if self.rate <= 0:
+            return float('inf')
+        return (1 - tokens) / self.rate
+
+    def _maybe_sweep(self, now: float):
+        if now >= self._next_sweep:
+            self._next_sweep = now + self.sweep_interval
+            for key in [k for k, (tokens, updated_at) in self._buckets.items()
+                        if tokens + (now - updated_at) * self.rate >= self.capacity]:
+                del self._buckets[key]
+        while len(self._buckets) > self.max_keys:
+            del self._buckets[next(iter(self._buckets))]
+
+    def check(self, key: Hashable) -> float:
+        """Seconds until a token is available for the key (0 if one is now)"""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                return 0.0
+            tokens = min(self.capacity, bucket[0] + (now - bucket[1]) * self.rate)
+            return self._wait_time(tokens)
+
+    def consume(self, key: Hashable) -> float:
+        """Take a token for the key; returns 0 on success, else seconds to wait"""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._refill(key, now)
+            wait = self._wait_time(bucket[0])
+            if not wait:
+                bucket[0] -= 1
+            self._maybe_sweep(now)
+            return wait
+
+    def reset(self, key: Hashable):
+        """Forget a key's bucket"""
+        with self._lock:
+            self._buckets.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+# Login throttles: per client IP (all attempts) and per username (failures)
+login_ip_limiter = TokenBucketLimiter(LOGIN_RATE_IP_BURST, LOGIN_RATE_IP_PER_MINUTE / 60, RATE_LIMIT_MAX_KEYS)
+login_user_limiter = TokenBucketLimiter(LOGIN_RATE_USER_BURST, LOGIN_RATE_USER_PER_MINUTE / 60, RATE_LIMIT_MAX_KEYS)
@@ -1,17 +1,47 @@
+import asyncio
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone, timedelta
-from typing import Optional
-from fastapi import Depends, HTTPException
+from typing import Dict, Optional, Tuple
+from fastapi import Depends, HTTPException, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from passlib.context import CryptContext
 import jwt
 
-from .config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
+from .config import (
+    SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, PRINCIPAL_CACHE_TTL, PRINCIPAL_CACHE_SIZE,
+    BCRYPT_ROUNDS, PASSWORD_HASH_WORKERS, TOKEN_CACHE_SIZE
+)
 from .database import get_db, dict_from_row
+from .cache import TTLCache
+from .invalidation import invalidations
+from .api_tokens import is_api_token, lookup_api_token, api_token_usage
 
 # Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 security = HTTPBearer()
 
+# bcrypt releases the GIL, so a small thread pool keeps hashing off the event
+# loop while bounding how many CPU-heavy hashes run at once
+password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+
+# Authenticated principals (user rows) keyed by user id
+principal_cache = TTLCache(PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL)
+
+# Roles from least to most privileged, for narrowing API token scopes
+ROLE_RANK = {'user': 0, 'moderator': 1, 'admin': 2}
+
+# Verified token claims keyed by sha256(token); entries never outlive the token
+token_cache = TTLCache(TOKEN_CACHE_SIZE, ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
+# Revoked token digests -> expiry (epoch seconds), mirrored from revoked_tokens.
+# Unlike the caches this is never size-evicted; entries leave once expired.
+_revoked_tokens: Dict[bytes, float] = {}
+_revoked_lock = threading.Lock()
+_revoked_loaded = False
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
     return pwd_context.verify(plain_password, hashed_password)
@@ -20,6 +50,23 @@ def get_password_hash(password: str) -> str:
     """Hash a password"""
     return pwd_context.hash(password)
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password on the password hashing pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, pwd_context.verify, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password on the password hashing pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, pwd_context.hash, password)
+
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify a password, returning a new hash if the stored one uses outdated settings"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        password_executor, pwd_context.verify_and_update, plain_password, hashed_password
+    )
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token"""
     to_encode = data.copy()
@@ -27,38 +74,194 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
         expire = datetime.now(timezone.utc) + expires_delta
     else:
         expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    # Sub-second iat so per-user revocation cutoffs are exact
+    to_encode.update({"exp": expire, "iat": time.time()})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def token_digest(token: str) -> bytes:
+    """Digest a token for use as a cache or revocation key"""
+    return hashlib.sha256(token.encode()).digest()
+
+def load_revoked_tokens():
+    """(Re)load unexpired token revocations from the database"""
+    global _revoked_loaded
+    now = time.time()
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM revoked_tokens WHERE expires_at <= ?", (now,))
+    conn.commit()
+    cursor.execute("SELECT token_hash, expires_at FROM revoked_tokens")
+    revoked = {bytes.fromhex(row[0]): row[1] for row in cursor.fetchall()}
+    conn.close()
+
+    with _revoked_lock:
+        _revoked_tokens.clear()
+        _revoked_tokens.update(revoked)
+        _revoked_loaded = True
+
+def _is_revoked(digest: bytes) -> bool:
+    if not _revoked_loaded:
+        load_revoked_tokens()
+    expires_at = _revoked_tokens.get(digest)
+    return expires_at is not None and expires_at > time.time()
+
 def decode_token(token: str) -> dict:
-    """Decode and validate a JWT token"""
+    """Decode and validate a JWT token.
+
+    Verified claims are cached by token digest until the token expires, so
+    repeated requests with the same token skip signature verification.
+    """
+    digest = token_digest(token)
+    if _is_revoked(digest):
+        raise HTTPException(status_code=401, detail="Token revoked")
+
+    payload = token_cache.get(digest)
+    if payload is not None:
+        if payload.get("exp", 0) > time.time():
+            return dict(payload)
+        token_cache.pop(digest)
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
-    except jwt.JWTError:
+    except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
-    """Dependency to get current authenticated user"""
-    token = credentials.credentials
+    if "exp" in payload:
+        token_cache.set(digest, payload, ttl=payload["exp"] - time.time())
+    return dict(payload)
+
+def revoke_token(token: str):
+    """Revoke a single token until it would have expired anyway"""
     payload = decode_token(token)
-    user_id = payload.get("sub")
-    if not user_id:
-        raise HTTPException(status_code=401, detail="Invalid token")
-    
+    digest = token_digest(token)
+    now = time.time()
+    expires_at = payload.get("exp", now + ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM revoked_tokens WHERE expires_at <= ?", (now,))
+    cursor.execute('''
+        INSERT OR REPLACE INTO revoked_tokens (token_hash, user_id, expires_at)
+        VALUES (?, ?, ?)
+    ''', (digest.hex(), payload.get("sub"), expires_at))
+    conn.commit()
+    conn.close()
+
+    invalidations.invalidate('revoked_token', [digest.hex(), expires_at])
+
+def _apply_revocation(key: list):
+    digest, expires_at = bytes.fromhex(key[0]), key[1]
+    now = time.time()
+    with _revoked_lock:
+        for stale in [k for k, exp in _revoked_tokens.items() if exp <= now]:
+            del _revoked_tokens[stale]
+        _revoked_tokens[digest] = expires_at
+    token_cache.pop(digest)
+
+invalidations.register('revoked_token', _apply_revocation)
+
+def revoke_user_tokens(user_id: str):
+    """Revoke every token issued to a user up to now"""
     conn = get_db()
     cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
-    user = cursor.fetchone()
+    cursor.execute("UPDATE users SET tokens_valid_after = ? WHERE id = ?", (time.time(), user_id))
+    conn.commit()
     conn.close()
+    invalidate_principal(user_id)
+
+def load_user(user_id: str) -> Optional[dict]:
+    """Get a user by ID, served from the principal cache when possible"""
+    user = principal_cache.get(user_id)
+    if user is None:
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
+        row = cursor.fetchone()
+        conn.close()
+        
+        if not row:
+            return None
+        user = dict_from_row(row)
+        principal_cache.set(user_id, user)
+    
+    # Hand out a copy so callers can never mutate the cached principal
+    return dict(user)
+
+def invalidate_principal(user_id: Optional[str] = None):
+    """Drop a cached principal on every worker after its user row changed (all if no ID given)"""
+    invalidations.invalidate('principal', user_id)
+
+def _drop_principal(user_id: Optional[str]):
+    if user_id is None:
+        principal_cache.clear()
+    else:
+        principal_cache.pop(user_id)
+
+invalidations.register('principal', _drop_principal)
+
+def _get_user_from_api_token(token: str) -> dict:
+    record = lookup_api_token(token)
+    if not record:
+        raise HTTPException(status_code=401, detail="Invalid API token")
+    
+    user = load_user(record['user_id'])
+    if not user:
+        raise HTTPException(status_code=401, detail="User not found")
     
+    # A token can only narrow its owner's role, never widen it
+    if record.get('role') and ROLE_RANK.get(record['role'], 0) < ROLE_RANK.get(user['role'], 0):
+        user['role'] = record['role']
+    user['api_token_id'] = record['id']
+    user['token_orchestrator_ids'] = record.get('orchestrator_ids')
+    
+    api_token_usage.mark(record['id'])
+    return user
+
+def in_token_scope(user: dict, orch_id: str) -> bool:
+    """Check an orchestrator is within the scope of the API token used (always true for sessions)"""
+    scope = user.get('token_orchestrator_ids')
+    return scope is None or orch_id in scope
+
+def check_token_scope(user: dict, orch_id: Optional[str]):
+    """Reject API tokens used against an orchestrator outside their scope.
+
+    Applied to every route with an {orch_id} path parameter; routes taking
+    an orchestrator from a body, query or chat channel, or listing several
+    orchestrators, check or filter with ``in_token_scope`` themselves.
+    """
+    if orch_id and not in_token_scope(user, orch_id):
+        raise HTTPException(status_code=403, detail="API token is not scoped to this orchestrator")
+
+def get_user_from_token(token: str) -> dict:
+    """Resolve a bearer token (JWT or API token) to its user, raising 401 if it is not valid"""
+    if is_api_token(token):
+        return _get_user_from_api_token(token)
+    
+    payload = decode_token(token)
+    user_id = payload.get("sub")
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    
+    user = load_user(user_id)
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
     
-    return dict_from_row(user)
+    if payload.get("iat", 0) < (user.get("tokens_valid_after") or 0):
+        raise HTTPException(status_code=401, detail="Token revoked")
+    
+    return user
+
+async def get_current_user(
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> dict:
+    """Dependency to get current authenticated user"""
+    user = get_user_from_token(credentials.credentials)
+    check_token_scope(user, request.path_params.get('orch_id'))
+    return user
 
 async def get_current_admin_user(current_user: dict = Depends(get_current_user)) -> dict:
     """Dependency to require admin role"""
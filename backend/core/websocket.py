@@ -1,51 +1,402 @@
+import asyncio
+import json
 import logging
-from typing import Dict
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple
 from fastapi import WebSocket
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from .bus import BroadcastBus, LocalBus, create_bus
+from .config import (
+    WS_SEND_QUEUE_SIZE, WS_SEND_TIMEOUT, WS_PING_INTERVAL, WS_PONG_TIMEOUT, WS_IDLE_TIMEOUT,
+    PRESENCE_HEARTBEAT_INTERVAL, PRESENCE_DIFF_DELAY
+)
+from .invalidation import invalidations
+from .metrics import metrics
+from .presence import PresenceTracker
+
 logger = logging.getLogger(__name__)
 
-class ConnectionManager:
-    """Manages WebSocket connections for real-time features"""
-    
+# Close code sent to clients dropped for falling behind ("try again later")
+SLOW_CLIENT_CLOSE_CODE = 1013
+
+# Close codes for clients that stopped answering pings or stayed idle
+UNRESPONSIVE_CLOSE_CODE = 1011
+IDLE_CLOSE_CODE = 4000
+
+PING_FRAME = '{"type":"ping"}'
+
+# Channel every connection joins on connect; presence diffs are sent here
+GLOBAL_CHANNEL = 'global'
+
+def encode_message(message: dict) -> str:
+    """Serialize a message into a text frame (orjson when installed)"""
+    if orjson is not None:
+        return orjson.dumps(message).decode()
+    return json.dumps(message, separators=(',', ':'))
+
+def _is_pong(text: str) -> bool:
+    if '"pong"' not in text or len(text) > 64:
+        return False
+    try:
+        return json.loads(text).get('type') == 'pong'
+    except (ValueError, AttributeError):
+        return False
+
+async def close_websocket(websocket: WebSocket, code: int):
+    """Close a WebSocket, giving up after the send timeout"""
+    try:
+        await asyncio.wait_for(websocket.close(code=code), WS_SEND_TIMEOUT)
+    except Exception:
+        pass
+
+class Liveness:
+    """When a client was last heard from (any frame) and last active (anything but a pong)"""
+
+    __slots__ = ('last_seen', 'last_active')
+
     def __init__(self):
-        self.active_connections: Dict[str, WebSocket] = {}  # user_id -> websocket
+        self.last_seen = self.last_active = time.monotonic()
+
+    def expiry(self) -> Tuple[Optional[float], Optional[str]]:
+        """Get the monotonic time the client is reaped at and why, or (None, None)"""
+        deadlines = []
+        if WS_PING_INTERVAL > 0:
+            deadlines.append((self.last_seen + WS_PING_INTERVAL + WS_PONG_TIMEOUT, 'unresponsive'))
+        if WS_IDLE_TIMEOUT > 0:
+            deadlines.append((self.last_active + WS_IDLE_TIMEOUT, 'idle'))
+        return min(deadlines) if deadlines else (None, None)
+
+async def receive_live(websocket: WebSocket, liveness: Liveness) -> Optional[str]:
+    """Receive the next client frame other than a pong.
+
+    Returns None once the client is closed for missing its pongs or for
+    staying idle, counting it in ws_reaped_unresponsive or ws_reaped_idle.
+    """
+    while True:
+        deadline, reason = liveness.expiry()
+        try:
+            if deadline is None:
+                text = await websocket.receive_text()
+            else:
+                async with asyncio.timeout(deadline - time.monotonic()):
+                    text = await websocket.receive_text()
+        except TimeoutError:
+            metrics.inc(f'ws_reaped_{reason}')
+            logger.info(f"Closing {reason} WebSocket")
+            await close_websocket(websocket, UNRESPONSIVE_CLOSE_CODE if reason == 'unresponsive' else IDLE_CLOSE_CODE)
+            return None
+
+        now = time.monotonic()
+        liveness.last_seen = now
+        if not _is_pong(text):
+            liveness.last_active = now
+            return text
+
+async def ping_loop(websocket: WebSocket):
+    """Ping a client every WS_PING_INTERVAL until cancelled or the send fails"""
+    if WS_PING_INTERVAL <= 0:
+        return
+    try:
+        while True:
+            await asyncio.sleep(WS_PING_INTERVAL)
+            async with asyncio.timeout(WS_SEND_TIMEOUT):
+                await websocket.send_text(PING_FRAME)
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        pass  # The receive side notices the missing pongs
+
+class ClientConnection:
+    """A WebSocket with a bounded outbound queue drained by its own writer task"""
+
+    __slots__ = ('websocket', 'user', 'queue', 'writer', 'channels', 'liveness')
+
+    def __init__(self, websocket: WebSocket, user: dict, queue_size: int = WS_SEND_QUEUE_SIZE):
+        self.websocket = websocket
+        self.user = user  # {id, username, role}
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.writer: Optional[asyncio.Task] = None
+        self.channels: Set[str] = set()
+        self.liveness = Liveness()
+
+    def enqueue(self, frame: str) -> bool:
+        """Queue an encoded frame without waiting; False if the queue is full"""
+        try:
+            self.queue.put_nowait(frame)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    @property
+    def user_id(self) -> str:
+        return self.user['id']
+
+class ConnectionManager:
+    """Manages WebSocket connections for real-time features.
+
+    A user may hold many connections (tabs, devices); presence is reference
+    counted, so a user only joins when their first connection opens and
+    leaves when their last one closes.
 
-    async def connect(self, websocket: WebSocket, user_id: str):
+    Connections subscribe to channels (every one starts in 'global') and a
+    channel -> subscribers index lets a channel broadcast touch only the
+    connections that asked for it.
+
+    Broadcasts and presence changes travel over a broadcast bus, so with a
+    cross-worker bus every worker delivers them to its own clients and
+    presence covers users connected to any worker. Each worker heartbeats
+    its users so a worker that dies without saying so is timed out, and
+    presence changes reach clients as coalesced presence_diff messages.
+
+    Sends never run on the caller: each connection has a bounded queue and a
+    writer task, so a stalled client only ever delays itself. Clients whose
+    queue overflows or whose sends time out are dropped. Every connection
+    is pinged periodically; ``receive`` closes clients that stop answering.
+    """
+
+    def __init__(self, bus: Optional[BroadcastBus] = None):
+        self.active_connections: Dict[str, Set[ClientConnection]] = {}  # user_id -> local connections
+        self.channels: Dict[str, Set[ClientConnection]] = {}  # channel -> local subscribers
+        self.presence = PresenceTracker()
+        self.bus = bus or LocalBus()
+        self.bus.bind(self._on_envelope)
+        self._listeners: List[Callable[[dict], None]] = []
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._pinger: Optional[asyncio.Task] = None
+        self._diff_scheduled = False
+
+    def add_listener(self, listener: Callable[[dict], None]):
+        """Call a function with every broadcast message, from any worker, before it is sent"""
+        self._listeners.append(listener)
+
+    async def start(self):
+        """Join the broadcast bus, route invalidations over it, ask other workers who is online and start heartbeats"""
+        await self.bus.start()
+        invalidations.bind(self.bus.publish)
+        self.bus.publish({"type": "presence_sync"})
+        self._heartbeat = asyncio.create_task(self._heartbeat_loop())
+        if WS_PING_INTERVAL > 0:
+            self._pinger = asyncio.create_task(self._ping_loop())
+
+    async def stop(self):
+        """Leave the broadcast bus, releasing this worker's presence"""
+        for task in (self._heartbeat, self._pinger):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._heartbeat = self._pinger = None
+        self.bus.publish({"type": "worker_stopped"})
+        invalidations.bind(None)
+        await self.bus.stop()
+        self.presence.release_origin(self.bus.origin)
+        try:
+            await asyncio.to_thread(self.presence.flush, [])
+        except Exception as e:
+            logger.error(f"Failed to flush presence on shutdown: {e}")
+
+    async def connect(self, websocket: WebSocket, user: dict) -> ClientConnection:
         """Accept and track a new WebSocket connection"""
         await websocket.accept()
-        self.active_connections[user_id] = websocket
-        logger.info(f"WebSocket connected: user {user_id}")
+        user = {'id': user['id'], 'username': user['username'], 'role': user.get('role')}
+        connection = ClientConnection(websocket, user)
+        connection.writer = asyncio.create_task(self._write_loop(connection))
+        connections = self.active_connections.setdefault(user['id'], set())
+        connections.add(connection)
+        self.subscribe(connection, GLOBAL_CHANNEL)
+        logger.info(f"WebSocket connected: user {user['id']} ({len(connections)} open)")
+        if len(connections) == 1:
+            self.bus.publish({"type": "presence", "user": user, "online": True})
+        return connection
+
+    async def receive(self, connection: ClientConnection) -> Optional[str]:
+        """Wait for a client's next message; None once it was closed as unresponsive or idle"""
+        return await receive_live(connection.websocket, connection.liveness)
 
-    def disconnect(self, user_id: str):
+    def disconnect(self, connection: ClientConnection):
         """Remove a WebSocket connection"""
-        if user_id in self.active_connections:
-            del self.active_connections[user_id]
-            logger.info(f"WebSocket disconnected: user {user_id}")
+        connection.writer.cancel()
+        if self._remove(connection):
+            logger.info(f"WebSocket disconnected: user {connection.user_id}")
+
+    def _remove(self, connection: ClientConnection) -> bool:
+        """Untrack a connection, releasing the user's presence if it was their last"""
+        connections = self.active_connections.get(connection.user_id)
+        if not connections or connection not in connections:
+            return False
+        connections.discard(connection)
+        for channel in list(connection.channels):
+            self.unsubscribe(connection, channel)
+        if not connections:
+            del self.active_connections[connection.user_id]
+            self.bus.publish({"type": "presence", "user": connection.user, "online": False})
+        return True
+
+    def subscribe(self, connection: ClientConnection, channel: str):
+        """Deliver a channel's broadcasts to a connection"""
+        connection.channels.add(channel)
+        self.channels.setdefault(channel, set()).add(connection)
+
+    def unsubscribe(self, connection: ClientConnection, channel: str):
+        """Stop delivering a channel's broadcasts to a connection"""
+        connection.channels.discard(channel)
+        subscribers = self.channels.get(channel)
+        if subscribers is not None:
+            subscribers.discard(connection)
+            if not subscribers:
+                del self.channels[channel]
 
     def get_online_users(self) -> list:
-        """Get list of currently connected user IDs"""
-        return list(self.active_connections.keys())
+        """Get list of currently connected user IDs, on any worker"""
+        return [user['id'] for user in self.presence.online_users()]
+
+    def _local_users(self) -> List[dict]:
+        return [next(iter(connections)).user for connections in self.active_connections.values()]
 
-    async def broadcast(self, message: dict):
-        """Broadcast message to all connected clients"""
-        disconnected = []
-        for user_id, connection in self.active_connections.items():
+    def _on_envelope(self, envelope: dict):
+        """Apply an envelope from the bus (this worker's own included)"""
+        kind, origin = envelope.get('type'), envelope.get('origin')
+        if kind == 'broadcast':
+            message, frame = envelope.get('message'), envelope.get('frame')
+            if message is not None:
+                if message.get('type') == 'user_renamed':
+                    self._rename(message['user_id'], message['username'])
+                for listener in self._listeners:
+                    try:
+                        listener(message)
+                    except Exception as e:
+                        logger.error(f"Broadcast listener failed: {e}")
+            channel = envelope.get('channel')
+            if channel is not None and channel not in self.channels:
+                return  # Listeners have run; nobody here is subscribed
+            self._fanout(frame if frame is not None else encode_message(message), channel)
+        elif kind == 'presence':
+            if envelope['online']:
+                self.presence.join(envelope['user'], origin)
+            else:
+                self.presence.leave(envelope['user']['id'], origin)
+            self._schedule_diff()
+        elif kind == 'presence_heartbeat':
+            self.presence.heartbeat(envelope['users'], origin)
+            self._schedule_diff()
+        elif origin == self.bus.origin:
+            return
+        elif kind == 'presence_sync':
+            # A worker just started: tell it who is connected here
+            self.bus.publish({"type": "presence_heartbeat", "users": self._local_users()})
+        elif kind == 'worker_stopped':
+            self.presence.release_origin(origin)
+            self._schedule_diff()
+        elif kind == 'invalidate':
+            invalidations.apply(envelope['name'], envelope.get('key'))
+
+    def _rename(self, user_id: str, username: str):
+        """Keep heartbeats and the online list in step with a username change"""
+        for connection in self.active_connections.get(user_id, ()):
+            connection.user = {**connection.user, 'username': username}
+        self.presence.rename(user_id, username)
+
+    def _schedule_diff(self):
+        """Push presence changes after a short delay so bursts go out as one diff"""
+        if self._diff_scheduled:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._diff_scheduled = True
+        loop.call_later(PRESENCE_DIFF_DELAY, self._send_diff)
+
+    def _send_diff(self):
+        self._diff_scheduled = False
+        diff = self.presence.take_diff()
+        if diff is not None:
+            self._fanout(encode_message({"type": "presence_diff", **diff}), GLOBAL_CHANNEL)
+
+    async def _ping_loop(self):
+        """Ping every local connection through its queue"""
+        while True:
+            await asyncio.sleep(WS_PING_INTERVAL)
+            self._fanout(PING_FRAME)
+
+    async def _heartbeat_loop(self):
+        """Refresh this worker's sessions, expire silent workers and write last_seen"""
+        while True:
+            await asyncio.sleep(PRESENCE_HEARTBEAT_INTERVAL)
             try:
-                await connection.send_json(message)
-            except Exception:
-                disconnected.append(user_id)
-        
-        # Clean up disconnected clients
-        for user_id in disconnected:
-            self.disconnect(user_id)
+                users = self._local_users()
+                self.bus.publish({"type": "presence_heartbeat", "users": users})
+                if self.presence.expire():
+                    self._schedule_diff()
+                await asyncio.to_thread(self.presence.flush, users)
+            except Exception as e:
+                logger.error(f"Presence heartbeat failed: {e}")
+
+    async def _write_loop(self, connection: ClientConnection):
+        """Drain a connection's queue, dropping it if a send fails or stalls"""
+        try:
+            while True:
+                frame = await connection.queue.get()
+                async with asyncio.timeout(WS_SEND_TIMEOUT):
+                    await connection.websocket.send_text(frame)
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            metrics.inc('ws_send_timeouts')
+            self._drop(connection, "send timed out")
+        except Exception:
+            metrics.inc('ws_send_failures')
+            self._drop(connection, None)
+
+    def _drop(self, connection: ClientConnection, reason: Optional[str]):
+        """Stop tracking a connection and close it if it is merely slow"""
+        if reason:
+            logger.warning(f"Dropping WebSocket for user {connection.user_id}: {reason}")
+            asyncio.create_task(close_websocket(connection.websocket, SLOW_CLIENT_CLOSE_CODE))
+        if connection.writer is not asyncio.current_task():
+            connection.writer.cancel()
+        self._remove(connection)
+
+    def _fanout(self, frame: str, channel: Optional[str] = None):
+        """Queue a frame for a channel's subscribers, or for every connection"""
+        if channel is None:
+            targets = [c for connections in self.active_connections.values() for c in connections]
+        else:
+            targets = list(self.channels.get(channel, ()))
+        overflowed = [c for c in targets if not c.enqueue(frame)]
+        for connection in overflowed:
+            metrics.inc('ws_dropped_slow')
+            self._drop(connection, "outbound queue full")
+
+    async def broadcast(self, message: dict, channel: Optional[str] = None):
+        """Queue a message for a channel's subscribers, or every client, on every worker.
+
+        The message is serialized once per worker and the same frame is
+        queued for every connection.
+        """
+        self.bus.publish({"type": "broadcast", "message": message, "channel": channel})
+
+    async def broadcast_frame(self, frame: str, channel: Optional[str] = None):
+        """Queue an already encoded frame for a channel or every client (listeners are not called)"""
+        self.bus.publish({"type": "broadcast", "frame": frame, "channel": channel})
 
     async def send_personal(self, user_id: str, message: dict):
-        """Send message to specific user"""
-        if user_id in self.active_connections:
-            try:
-                await self.active_connections[user_id].send_json(message)
-            except Exception:
-                self.disconnect(user_id)
+        """Send message to every connection of a specific user"""
+        connections = self.active_connections.get(user_id)
+        if not connections:
+            return
+        frame = encode_message(message)
+        overflowed = [c for c in connections if not c.enqueue(frame)]
+        for connection in overflowed:
+            metrics.inc('ws_dropped_slow')
+            self._drop(connection, "outbound queue full")
 
 # Global chat manager instance
-chat_manager = ConnectionManager()
+chat_manager = ConnectionManager(create_bus())
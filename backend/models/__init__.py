@@ -1,6 +1,6 @@
-from .user import UserCreate, UserLogin, UserUpdate, User, Token, PasswordChange
+from .user import UserCreate, UserLogin, UserUpdate, User, Token, PasswordChange, ApiTokenCreate
 from .orchestrator import OrchestratorCreate, OrchestratorUpdate, Orchestrator
 from .session import SessionCreate, SessionUpdate, Session, SessionRSVP
-from .system import SystemStatus, AdminWizard, AdminWizardComplete, FeatureFlags
-from .access import UserOrchestratorLink, ServerLink
+from .system import SystemStatus, AdminWizard, AdminWizardComplete, FeatureFlags, RetentionPolicy, RetentionPolicies
+from .access import UserOrchestratorLink, ServerLink, AccessLink, BulkAccessLinks
 from .audit import AuditLogEntry, AuditLogCreate
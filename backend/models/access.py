@@ -1,4 +1,5 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from typing import List, Optional
 
 class UserOrchestratorLink(BaseModel):
     user_id: str
@@ -9,3 +10,13 @@ class ServerLink(BaseModel):
     orchestrator_id: str
     server_uid: str
     permissions: str = "read"
+
+class AccessLink(BaseModel):
+    user_id: str
+    orchestrator_id: str
+    server_uid: Optional[str] = None  # Server link when set, orchestrator link otherwise
+    permissions: str = "read"
+
+class BulkAccessLinks(BaseModel):
+    add: List[AccessLink] = Field(default_factory=list, max_length=1000)
+    remove: List[AccessLink] = Field(default_factory=list, max_length=1000)
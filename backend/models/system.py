@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr, field_validator
+from pydantic import BaseModel, EmailStr, Field, field_validator
 from typing import Optional, Dict
 import re
 
@@ -38,3 +38,12 @@ class FeatureFlags(BaseModel):
     chat: bool = True
     gaming_sessions: bool = True
     server_stats: bool = True
+
+class RetentionPolicy(BaseModel):
+    enabled: bool = False
+    days: int = Field(90, ge=1)
+    archive: bool = True
+
+class RetentionPolicies(BaseModel):
+    chat_messages: Optional[RetentionPolicy] = None
+    audit_log: Optional[RetentionPolicy] = None
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional
+from pydantic import BaseModel, EmailStr, Field
+from typing import Optional, List
 
 class UserCreate(BaseModel):
     username: str
@@ -34,3 +34,9 @@ class Token(BaseModel):
 class PasswordChange(BaseModel):
     current_password: Optional[str] = None  # Not required for admin reset
     new_password: str
+
+class ApiTokenCreate(BaseModel):
+    name: str = Field(..., min_length=1, max_length=100)
+    role: Optional[str] = None  # Narrows the owner's role; defaults to it
+    orchestrator_ids: Optional[List[str]] = None  # None means all the owner can access
+    expires_in_days: Optional[int] = Field(None, ge=1)
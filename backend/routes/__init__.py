@@ -10,6 +10,7 @@ from .chat import router as chat_router
 from .console import router as console_router
 from .backup import router as backup_router
 from .notifications import router as notifications_router
+from .servers import router as servers_router
 
 # Create main API router
 api_router = APIRouter(prefix="/api")
@@ -25,3 +26,4 @@ api_router.include_router(chat_router, tags=["Chat"])
 api_router.include_router(console_router, tags=["Console"])
 api_router.include_router(backup_router, tags=["Backup"])
 api_router.include_router(notifications_router, tags=["Notifications"])
+api_router.include_router(servers_router, tags=["Servers"])
@@ -1,25 +1,59 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, Query
+from fastapi import APIRouter, Depends, HTTPException, Request, Query, Response, UploadFile, File
+from fastapi.responses import StreamingResponse
 from typing import Optional
+import asyncio
+import json
 import uuid
-from datetime import datetime, timezone
+from datetime import datetime, timezone, timedelta
 
 from core.database import get_db, dict_from_row
-from core.security import get_current_admin_user, get_password_hash
+from core.security import get_current_admin_user, revoke_user_tokens
+from core.ratelimit import login_ip_limiter, login_user_limiter
+from core.metrics import metrics
+from core.websocket import chat_manager
 from models.user import UserCreate, UserUpdate, PasswordChange
-from models.access import UserOrchestratorLink, ServerLink
-from models.system import FeatureFlags
-from services.audit import AuditService
+from models.access import UserOrchestratorLink, ServerLink, BulkAccessLinks
+from models.system import FeatureFlags, RetentionPolicies
+from services.audit import AuditService, audit_writer
 from services.user import UserService
+from services.user_import import UserImportService
+from services.chat import chat_writer
 from services.features import FeatureService
+from services.retention import RetentionService
+from services.acl import access_index
+from services.access import AccessService
 
 router = APIRouter(prefix="/admin")
 
+# Running user imports, referenced so they are not garbage collected mid-import
+_import_tasks = set()
+
 # ============ User Management ============
 
 @router.get("/users")
-async def get_users(current_user: dict = Depends(get_current_admin_user)):
-    """Get all users with their access details"""
-    return UserService.get_all_users()
+async def get_users(
+    response: Response,
+    search: Optional[str] = None,
+    role: Optional[str] = None,
+    sort: str = Query("created_at", pattern="^(username|created_at|role)$"),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    current_user: dict = Depends(get_current_admin_user)
+):
+    """Get users with their access details, optionally searched and paginated.
+
+    The total number of matching users is returned in the X-Total-Count header.
+    """
+    users, total = UserService.search_users(search, role, sort, order, limit, offset)
+    response.headers["X-Total-Count"] = str(total)
+    return users
+
+@router.get("/users/stats")
+async def get_user_stats(current_user: dict = Depends(get_current_admin_user)):
+    """Get user counts per role"""
+    by_role = UserService.get_role_counts()
+    return {"total": sum(by_role.values()), "by_role": by_role}
 
 @router.post("/users")
 async def create_user(
@@ -45,7 +79,7 @@ async def create_user(
     
     conn.close()
     
-    user = UserService.create_user(
+    user = await UserService.create_user(
         username=user_data.username,
         email=user_data.email,
         password=user_data.password,
@@ -66,6 +100,60 @@ async def create_user(
     
     return user
 
+@router.post("/users/import")
+async def import_users(
+    request: Request,
+    file: UploadFile = File(...),
+    current_user: dict = Depends(get_current_admin_user)
+):
+    """Bulk create users from a CSV or JSON file.
+
+    Streams one NDJSON line per row as it is processed, then a summary line.
+    The import itself runs as a separate task, so a client disconnect only
+    stops the progress stream.
+    """
+    try:
+        rows = UserImportService.parse(await file.read(), file.filename or '')
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid import file: {e}")
+    if not rows:
+        raise HTTPException(status_code=400, detail="Import file has no rows")
+    
+    ip_address = request.client.host if request.client else None
+    filename = file.filename
+    results: asyncio.Queue = asyncio.Queue()
+    
+    async def run_import():
+        created = 0
+        try:
+            async for result in UserImportService.run(rows):
+                if result.get('status') == 'created':
+                    created += 1
+                results.put_nowait(result)
+        finally:
+            # One audit entry for the whole import, with partial counts if it was cut short
+            AuditService.log(
+                user_id=current_user['id'],
+                username=current_user['username'],
+                action_type='create',
+                category='user',
+                target_type='user_import',
+                details=f"Imported {created} of {len(rows)} users from {filename}",
+                ip_address=ip_address
+            )
+            results.put_nowait(None)
+    
+    # The import runs to completion even if the client stops reading the stream
+    task = asyncio.create_task(run_import())
+    _import_tasks.add(task)
+    task.add_done_callback(_import_tasks.discard)
+    
+    async def progress():
+        while (result := await results.get()) is not None:
+            yield json.dumps(result) + "\n"
+    
+    return StreamingResponse(progress(), media_type="application/x-ndjson")
+
 @router.put("/users/{user_id}")
 async def update_user(
     user_id: str,
@@ -82,6 +170,9 @@ async def update_user(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
+    if 'username' in updates:
+        await chat_manager.broadcast({"type": "user_renamed", "user_id": user_id, "username": user['username']})
+    
     # Log user update
     AuditService.log(
         user_id=current_user['id'],
@@ -112,6 +203,9 @@ async def delete_user(
     
     UserService.delete_user(user_id)
     
+    # Messages of deleted users drop out of chat history
+    await chat_manager.broadcast({"type": "user_messages_deleted", "user_id": user_id})
+    
     # Log user deletion
     AuditService.log(
         user_id=current_user['id'],
@@ -141,7 +235,7 @@ async def reset_user_password(
     if len(password_data.new_password) < 8:
         raise HTTPException(status_code=400, detail="Password must be at least 8 characters")
     
-    UserService.change_password(user_id, password_data.new_password)
+    await UserService.change_password(user_id, password_data.new_password)
     
     # Log password reset
     AuditService.log(
@@ -157,6 +251,33 @@ async def reset_user_password(
     
     return {"message": "Password reset successfully"}
 
+@router.post("/users/{user_id}/revoke-sessions")
+async def revoke_user_sessions(
+    user_id: str,
+    request: Request,
+    current_user: dict = Depends(get_current_admin_user)
+):
+    """Revoke every access token issued to a user so far"""
+    user = UserService.get_user_by_id(user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    revoke_user_tokens(user_id)
+    
+    # Log revocation
+    AuditService.log(
+        user_id=current_user['id'],
+        username=current_user['username'],
+        action_type='update',
+        category='auth',
+        target_type='user',
+        target_id=user_id,
+        details=f"Revoked all sessions of user {user['username']}",
+        ip_address=request.client.host if request.client else None
+    )
+    
+    return {"message": "User sessions revoked"}
+
 # ============ User Access Links ============
 
 @router.post("/link-user-orchestrator")
@@ -183,6 +304,7 @@ async def link_user_orchestrator(
         raise HTTPException(status_code=400, detail="Link already exists or invalid IDs")
     
     conn.close()
+    access_index.add_orchestrator(link.user_id, link.orchestrator_id)
     
     # Log link creation
     AuditService.log(
@@ -219,6 +341,7 @@ async def unlink_user_orchestrator(
     
     conn.commit()
     conn.close()
+    access_index.remove_orchestrator(link.user_id, link.orchestrator_id)
     
     # Log link deletion
     AuditService.log(
@@ -257,6 +380,7 @@ async def link_user_server(
         raise HTTPException(status_code=400, detail="Link already exists or invalid IDs")
     
     conn.close()
+    access_index.add_server(link.user_id, link.orchestrator_id, link.server_uid)
     
     # Log link creation
     AuditService.log(
@@ -293,6 +417,7 @@ async def unlink_user_server(
     
     conn.commit()
     conn.close()
+    access_index.remove_server(link.user_id, link.orchestrator_id, link.server_uid)
     
     # Log link deletion
     AuditService.log(
@@ -307,6 +432,35 @@ async def unlink_user_server(
     
     return {"message": "User unlinked from server"}
 
+@router.post("/links/bulk")
+async def bulk_update_links(
+    links: BulkAccessLinks,
+    request: Request,
+    current_user: dict = Depends(get_current_admin_user)
+):
+    """Add and remove many orchestrator/server links in one transaction"""
+    results = AccessService.apply_bulk(
+        [link.model_dump() for link in links.add],
+        [link.model_dump() for link in links.remove]
+    )
+    
+    summary = {}
+    for result in results:
+        summary[result['status']] = summary.get(result['status'], 0) + 1
+    
+    # One audit entry for the whole batch
+    AuditService.log(
+        user_id=current_user['id'],
+        username=current_user['username'],
+        action_type='update',
+        category='user',
+        target_type='access_links',
+        details="Bulk link update: " + ", ".join(f"{count} {status}" for status, count in sorted(summary.items())),
+        ip_address=request.client.host if request.client else None
+    )
+    
+    return {"results": results, "summary": summary}
+
 # ============ Chat Moderation ============
 
 @router.post("/users/{user_id}/ban-chat")
@@ -374,6 +528,7 @@ async def delete_user_chat_history(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
+    await chat_writer.flush_async()
     conn = get_db()
     cursor = conn.cursor()
     cursor.execute("DELETE FROM chat_messages WHERE user_id = ?", (user_id,))
@@ -381,6 +536,8 @@ async def delete_user_chat_history(
     conn.commit()
     conn.close()
     
+    await chat_manager.broadcast({"type": "user_messages_deleted", "user_id": user_id})
+    
     # Log chat history deletion
     AuditService.log(
         user_id=current_user['id'],
@@ -431,14 +588,155 @@ async def get_audit_log(
     category: Optional[str] = Query(None),
     limit: int = Query(100, le=500),
     offset: int = Query(0),
+    cursor: Optional[str] = Query(None),
+    direction: str = Query('next'),
     current_user: dict = Depends(get_current_admin_user)
 ):
-    """Get audit log entries"""
-    logs = AuditService.get_logs(category=category, limit=limit, offset=offset)
+    """Get audit log entries.
+
+    Pages are addressed by opaque cursors ('next' = older, 'prev' = newer);
+    ``offset`` is still honoured for older clients.
+    """
+    await audit_writer.flush_async()
+    if offset:
+        page = {
+            "logs": AuditService.get_logs(category=category, limit=limit, offset=offset),
+            "next_cursor": None,
+            "prev_cursor": None
+        }
+    else:
+        page = AuditService.get_logs_page(category=category, limit=limit, cursor=cursor, direction=direction)
     counts = AuditService.get_log_counts_by_category()
     
     return {
-        "logs": logs,
+        **page,
         "counts": counts,
         "total": sum(counts.values())
     }
+
+@router.get("/audit-log/summary")
+async def get_audit_log_summary(
+    days: int = Query(30, ge=1, le=366),
+    category: Optional[str] = Query(None),
+    current_user: dict = Depends(get_current_admin_user)
+):
+    """Get audit totals per category and per-day counts for the dashboard"""
+    since = (datetime.now(timezone.utc) - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+    await audit_writer.flush_async()
+    counts = AuditService.get_log_counts_by_category()
+    
+    return {
+        "counts": counts,
+        "total": sum(counts.values()),
+        "daily": AuditService.get_daily_counts(since, category=category)
+    }
+
+@router.post("/audit-log/counters/rebuild")
+async def rebuild_audit_counters(
+    request: Request,
+    dry_run: bool = Query(False),
+    current_user: dict = Depends(get_current_admin_user)
+):
+    """Check audit counters against the audit log and rebuild them on drift"""
+    result = await asyncio.to_thread(AuditService.rebuild_counters, dry_run)
+    
+    if result['rebuilt']:
+        AuditService.log(
+            user_id=current_user['id'],
+            username=current_user['username'],
+            action_type='update',
+            category='system',
+            target_type='audit_counters',
+            details=f"Rebuilt audit counters ({len(result['drift'])} drifted rows)",
+            ip_address=request.client.host if request.client else None
+        )
+    
+    return result
+
+# ============ Data Retention ============
+
+@router.get("/retention")
+async def get_retention_policies(current_user: dict = Depends(get_current_admin_user)):
+    """Get retention policies for chat and audit tables"""
+    return RetentionService.get_policies()
+
+@router.put("/retention")
+async def update_retention_policies(
+    policies: RetentionPolicies,
+    request: Request,
+    current_user: dict = Depends(get_current_admin_user)
+):
+    """Update retention policies"""
+    updated = RetentionService.update_policies(policies.model_dump(exclude_none=True))
+    
+    # Log retention update
+    AuditService.log(
+        user_id=current_user['id'],
+        username=current_user['username'],
+        action_type='update',
+        category='system',
+        target_type='retention',
+        details=f"Updated retention policies: {updated}",
+        ip_address=request.client.host if request.client else None
+    )
+    
+    return updated
+
+@router.post("/retention/run")
+async def run_retention(
+    request: Request,
+    current_user: dict = Depends(get_current_admin_user)
+):
+    """Apply retention policies now and compact the database"""
+    result = await asyncio.to_thread(RetentionService.run)
+    deleted = sum(r['deleted'] for r in result['results'])
+    
+    # Log retention run
+    AuditService.log(
+        user_id=current_user['id'],
+        username=current_user['username'],
+        action_type='delete',
+        category='system',
+        target_type='retention',
+        details=f"Ran retention: {deleted} rows archived/deleted, {result['pages_released']} pages released",
+        ip_address=request.client.host if request.client else None
+    )
+    
+    return result
+
+@router.post("/database/vacuum")
+async def enable_incremental_vacuum(
+    request: Request,
+    current_user: dict = Depends(get_current_admin_user)
+):
+    """One-time VACUUM that switches the database to incremental auto-vacuum"""
+    result = await asyncio.to_thread(RetentionService.enable_incremental_vacuum)
+    
+    if result['vacuumed']:
+        AuditService.log(
+            user_id=current_user['id'],
+            username=current_user['username'],
+            action_type='update',
+            category='system',
+            target_type='database',
+            details=f"Enabled incremental auto-vacuum: {result['pages_before']} -> {result['pages_after']} pages",
+            ip_address=request.client.host if request.client else None
+        )
+    
+    return result
+
+@router.get("/database/stats")
+async def get_database_stats(current_user: dict = Depends(get_current_admin_user)):
+    """Get row counts and sizes of all tables"""
+    return await asyncio.to_thread(RetentionService.get_table_stats)
+
+@router.get("/metrics")
+async def get_metrics(current_user: dict = Depends(get_current_admin_user)):
+    """Get process-local operational counters"""
+    return {
+        "counters": metrics.snapshot(),
+        "rate_limiter_keys": {
+            "login_ip": len(login_ip_limiter),
+            "login_user": len(login_user_limiter)
+        }
+    }
@@ -1,15 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.security import HTTPAuthorizationCredentials
 from datetime import timedelta
+import math
 
 from core.database import get_db, dict_from_row
 from core.security import (
-    verify_password, get_password_hash, create_access_token, 
-    get_current_user, get_current_admin_user, ACCESS_TOKEN_EXPIRE_MINUTES
+    verify_password_async, verify_and_update_password, create_access_token, 
+    revoke_token, security, get_current_user, get_current_admin_user,
+    ACCESS_TOKEN_EXPIRE_MINUTES, ROLE_RANK
 )
 from core.config import ROLE_PERMISSIONS
-from models.user import UserCreate, UserLogin, Token, PasswordChange
+from core.ratelimit import login_ip_limiter, login_user_limiter
+from core.metrics import metrics
+from models.user import UserCreate, UserLogin, Token, PasswordChange, ApiTokenCreate
 from services.audit import AuditService
 from services.user import UserService
+from services.api_tokens import ApiTokenService
+from services.orchestrator import OrchestratorService
 
 router = APIRouter(prefix="/auth")
 
@@ -29,9 +36,39 @@ def _token_response(user: dict, access_token: str) -> dict:
         }
     }
 
+def _require_session(current_user: dict):
+    """Reject API tokens on endpoints that need a login session (sessions, passwords, tokens)"""
+    if current_user.get('api_token_id'):
+        raise HTTPException(status_code=403, detail="This endpoint requires a login session, not an API token")
+
+def _raise_throttled(retry_after: float):
+    raise HTTPException(
+        status_code=429,
+        detail="Too many login attempts, try again later",
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+    )
+
+def _record_failed_login(username_key: str):
+    metrics.inc('login_failed')
+    login_user_limiter.consume(username_key)
+
 @router.post("/login", response_model=Token)
 async def login(credentials: UserLogin, request: Request):
     """Authenticate user and return token"""
+    ip = request.client.host if request.client else None
+    username_key = credentials.username.lower()
+    
+    # Reject throttled clients before any database or bcrypt work
+    metrics.inc('login_attempts')
+    retry_after = login_ip_limiter.consume(ip)
+    if retry_after:
+        metrics.inc('login_throttled_ip')
+        _raise_throttled(retry_after)
+    retry_after = login_user_limiter.check(username_key)
+    if retry_after:
+        metrics.inc('login_throttled_user')
+        _raise_throttled(retry_after)
+    
     conn = get_db()
     cursor = conn.cursor()
     cursor.execute("SELECT * FROM users WHERE username = ?", (credentials.username,))
@@ -39,13 +76,20 @@ async def login(credentials: UserLogin, request: Request):
     conn.close()
     
     if not user:
+        _record_failed_login(username_key)
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     user_dict = dict_from_row(user)
     
-    if not verify_password(credentials.password, user_dict['password_hash']):
+    verified, new_hash = await verify_and_update_password(credentials.password, user_dict['password_hash'])
+    if not verified:
+        _record_failed_login(username_key)
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
+    # Transparently upgrade hashes made with an outdated cost factor
+    if new_hash:
+        UserService.set_password_hash(user_dict['id'], new_hash)
+    
     # Create token
     access_token = create_access_token(
         data={"sub": user_dict['id']},
@@ -53,7 +97,6 @@ async def login(credentials: UserLogin, request: Request):
     )
     
     # Log login
-    ip = request.client.host if request.client else None
     AuditService.log(
         user_id=user_dict['id'],
         username=user_dict['username'],
@@ -77,9 +120,33 @@ async def get_current_user_info(current_user: dict = Depends(get_current_user)):
         "created_at": current_user['created_at']
     }
 
+@router.post("/logout")
+async def logout(
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    current_user: dict = Depends(get_current_user)
+):
+    """Revoke the access token used for this request"""
+    # API tokens are revoked via DELETE /auth/tokens/{token_id}
+    _require_session(current_user)
+    revoke_token(credentials.credentials)
+    
+    AuditService.log(
+        user_id=current_user['id'],
+        username=current_user['username'],
+        action_type='logout',
+        category='auth',
+        details='User logged out',
+        ip_address=request.client.host if request.client else None
+    )
+    
+    return {"message": "Logged out"}
+
 @router.post("/refresh")
 async def refresh_token(current_user: dict = Depends(get_current_user)):
     """Refresh the access token"""
+    # An API token must never be traded for an unscoped, full-role JWT
+    _require_session(current_user)
     access_token = create_access_token(
         data={"sub": current_user['id']},
         expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -114,7 +181,7 @@ async def register_user(
 
     conn.close()
 
-    user = UserService.create_user(
+    user = await UserService.create_user(
         username=user_data.username,
         email=user_data.email,
         password=user_data.password,
@@ -150,25 +217,18 @@ async def change_password(
     current_user: dict = Depends(get_current_user)
 ):
     """Change current user's password"""
-    conn = get_db()
-    cursor = conn.cursor()
-    
+    _require_session(current_user)
     # Verify current password
     if password_data.current_password:
-        if not verify_password(password_data.current_password, current_user['password_hash']):
-            conn.close()
+        if not await verify_password_async(password_data.current_password, current_user['password_hash']):
             raise HTTPException(status_code=400, detail="Current password is incorrect")
     
     # Validate new password
     if len(password_data.new_password) < 8:
-        conn.close()
         raise HTTPException(status_code=400, detail="Password must be at least 8 characters")
     
     # Update password
-    new_hash = get_password_hash(password_data.new_password)
-    cursor.execute("UPDATE users SET password_hash = ? WHERE id = ?", (new_hash, current_user['id']))
-    conn.commit()
-    conn.close()
+    await UserService.change_password(current_user['id'], password_data.new_password)
     
     # Log password change
     AuditService.log(
@@ -182,3 +242,76 @@ async def change_password(
     )
     
     return {"message": "Password changed successfully"}
+
+# ============ API Tokens ============
+
+@router.get("/tokens")
+async def list_api_tokens(current_user: dict = Depends(get_current_user)):
+    """List the current user's API tokens"""
+    _require_session(current_user)
+    return ApiTokenService.get_user_tokens(current_user['id'])
+
+@router.post("/tokens")
+async def create_api_token(
+    token_data: ApiTokenCreate,
+    request: Request,
+    current_user: dict = Depends(get_current_user)
+):
+    """Create an API token; the token itself is only returned in this response"""
+    _require_session(current_user)
+    
+    if token_data.role is not None:
+        if token_data.role not in ROLE_PERMISSIONS:
+            raise HTTPException(status_code=400, detail="Invalid role")
+        if ROLE_RANK[token_data.role] > ROLE_RANK.get(current_user['role'], 0):
+            raise HTTPException(status_code=403, detail="Token role cannot exceed your own role")
+    
+    for orch_id in token_data.orchestrator_ids or []:
+        if not OrchestratorService.check_user_access(current_user['id'], orch_id, current_user['role']):
+            raise HTTPException(status_code=403, detail=f"No access to orchestrator {orch_id}")
+    
+    token = ApiTokenService.create(
+        user_id=current_user['id'],
+        name=token_data.name,
+        role=token_data.role,
+        orchestrator_ids=token_data.orchestrator_ids,
+        expires_in_days=token_data.expires_in_days
+    )
+    
+    AuditService.log(
+        user_id=current_user['id'],
+        username=current_user['username'],
+        action_type='create',
+        category='auth',
+        target_type='api_token',
+        target_id=token['id'],
+        details=f"Created API token: {token_data.name}",
+        ip_address=request.client.host if request.client else None
+    )
+    
+    return token
+
+@router.delete("/tokens/{token_id}")
+async def revoke_api_token(
+    token_id: str,
+    request: Request,
+    current_user: dict = Depends(get_current_user)
+):
+    """Revoke one of the current user's API tokens"""
+    _require_session(current_user)
+    
+    if not ApiTokenService.revoke(token_id, current_user['id']):
+        raise HTTPException(status_code=404, detail="API token not found")
+    
+    AuditService.log(
+        user_id=current_user['id'],
+        username=current_user['username'],
+        action_type='delete',
+        category='auth',
+        target_type='api_token',
+        target_id=token_id,
+        details="Revoked API token",
+        ip_address=request.client.host if request.client else None
+    )
+    
+    return {"message": "API token revoked"}
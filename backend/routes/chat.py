@@ -1,46 +1,80 @@
 from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect, Query, Request
-import uuid
-from datetime import datetime, timezone
+from typing import Optional
 import logging
 
-from core.database import get_db, dict_from_row
+from core.database import get_db
 from core.security import get_current_user, get_current_moderator_user, decode_token
-from core.websocket import chat_manager
+from core.websocket import chat_manager, GLOBAL_CHANNEL
 from services.audit import AuditService
+from services.chat import ChatService, chat_writer
 from services.features import FeatureService
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/chat")
 
+def _check_channel(current_user: dict, channel: str):
+    if not ChatService.can_access_channel(current_user, channel):
+        raise HTTPException(status_code=403, detail="No access to this channel")
+
 @router.get("/messages")
 async def get_messages(
     limit: int = Query(50, le=200),
+    channel: str = Query(GLOBAL_CHANNEL),
     current_user: dict = Depends(get_current_user)
 ):
     """Get chat messages (HTTP fallback)"""
     if not FeatureService.is_enabled('chat'):
         raise HTTPException(status_code=403, detail="Chat is disabled")
+    _check_channel(current_user, channel)
     
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT m.id, m.message, m.created_at, u.id as user_id, u.username
-        FROM chat_messages m
-        JOIN users u ON m.user_id = u.id
-        ORDER BY m.created_at DESC
-        LIMIT ?
-    ''', (limit,))
-    
-    messages = [dict_from_row(row) for row in cursor.fetchall()]
-    conn.close()
+    await chat_writer.flush_async()
+    return ChatService.get_recent_messages(limit, channel)
+
+@router.get("/history")
+async def get_history(
+    limit: int = Query(50, le=200),
+    cursor: Optional[str] = Query(None),
+    direction: str = Query('next'),
+    channel: str = Query(GLOBAL_CHANNEL),
+    current_user: dict = Depends(get_current_user)
+):
+    """Page through chat history with opaque cursors ('next' = older, 'prev' = newer)"""
+    if not FeatureService.is_enabled('chat'):
+        raise HTTPException(status_code=403, detail="Chat is disabled")
+    _check_channel(current_user, channel)
     
-    return list(reversed(messages))
+    await chat_writer.flush_async()
+    return ChatService.get_history_page(limit=limit, cursor=cursor, direction=direction, channel=channel)
+
+@router.get("/search")
+async def search_messages(
+    q: str = Query(..., min_length=1, max_length=200),
+    user_id: Optional[str] = Query(None),
+    channel: Optional[str] = Query(None),
+    since: Optional[str] = Query(None),
+    until: Optional[str] = Query(None),
+    sort: str = Query('relevance', pattern='^(relevance|recent)$'),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(50, ge=1, le=100),
+    current_user: dict = Depends(get_current_moderator_user)
+):
+    """Full-text search of chat messages (moderator+), limited to channels the user can read"""
+    if channel:
+        _check_channel(current_user, channel)
+        channels = None
+    else:
+        channels = ChatService.readable_channels(current_user)
+    await chat_writer.flush_async()
+    return ChatService.search(
+        q, user_id=user_id, channel=channel, since=since, until=until,
+        sort=sort, cursor=cursor, limit=limit, channels=channels
+    )
 
 @router.post("/messages")
 async def send_message(
     message: str = Query(..., max_length=1000),
+    channel: str = Query(GLOBAL_CHANNEL),
     current_user: dict = Depends(get_current_user)
 ):
     """Send a chat message (HTTP fallback)"""
@@ -53,39 +87,18 @@ async def send_message(
     message = message.strip()
     if not message:
         raise HTTPException(status_code=400, detail="Message cannot be empty")
+    _check_channel(current_user, channel)
     
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    msg_id = str(uuid.uuid4())
-    now = datetime.now(timezone.utc).isoformat()
+    # Stored by the chat writer; the broadcast does not wait for the commit
+    chat_message = ChatService.post_message(current_user, message, channel)
     
-    cursor.execute(
-        "INSERT INTO chat_messages (id, user_id, message, created_at) VALUES (?, ?, ?, ?)",
-        (msg_id, current_user['id'], message, now)
-    )
-    conn.commit()
-    conn.close()
-    
-    # Broadcast to WebSocket clients
+    # Broadcast to the channel's WebSocket subscribers
     await chat_manager.broadcast({
         "type": "chat_message",
-        "message": {
-            "id": msg_id,
-            "message": message,
-            "created_at": now,
-            "user_id": current_user['id'],
-            "username": current_user['username']
-        }
-    })
+        "message": chat_message
+    }, channel)
     
-    return {
-        "id": msg_id,
-        "message": message,
-        "created_at": now,
-        "user_id": current_user['id'],
-        "username": current_user['username']
-    }
+    return chat_message
 
 @router.delete("/messages/{message_id}")
 async def delete_message(
@@ -94,6 +107,7 @@ async def delete_message(
     current_user: dict = Depends(get_current_moderator_user)
 ):
     """Delete a chat message (moderator+)"""
+    await chat_writer.flush_async()
     conn = get_db()
     cursor = conn.cursor()
     
@@ -107,11 +121,11 @@ async def delete_message(
     conn.commit()
     conn.close()
     
-    # Broadcast deletion to clients
+    # Broadcast deletion to the message's channel
     await chat_manager.broadcast({
         "type": "message_deleted",
         "message_id": message_id
-    })
+    }, msg['channel'])
     
     # Log message deletion
     AuditService.log(
@@ -136,6 +150,7 @@ async def clear_all_chat(
     if current_user['role'] != 'admin':
         raise HTTPException(status_code=403, detail="Admin access required")
     
+    await chat_writer.flush_async()
     conn = get_db()
     cursor = conn.cursor()
     
@@ -169,20 +184,5 @@ async def get_online_users(current_user: dict = Depends(get_current_user)):
     if not FeatureService.is_enabled('online_users'):
         return []
     
-    online_ids = chat_manager.get_online_users()
-    
-    if not online_ids:
-        return []
-    
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    placeholders = ','.join(['?' for _ in online_ids])
-    cursor.execute(f'''
-        SELECT id, username, role FROM users WHERE id IN ({placeholders})
-    ''', online_ids)
-    
-    users = [dict_from_row(row) for row in cursor.fetchall()]
-    conn.close()
-    
-    return users
+    # Served from the in-memory presence set, kept current by heartbeats
+    return chat_manager.presence.online_users()
@@ -8,9 +8,9 @@ import asyncio
 import aiohttp
 import json
 
-from core.database import get_db
-from core.security import get_current_user, get_current_admin_user, decode_token
+from core.security import get_current_user, get_current_admin_user, get_user_from_token, check_token_scope
 from core.orchestrator_url import resolve_orchestrator_url
+from core.websocket import Liveness, receive_live, ping_loop
 from services.orchestrator import OrchestratorService
 
 router = APIRouter(prefix="/console")
@@ -72,6 +72,15 @@ async def get_server_logs(
         }
 
 
+async def _wait_closed(closed: asyncio.Event, seconds: float):
+    """Sleep until the client closes or the time is up"""
+    try:
+        async with asyncio.timeout(seconds):
+            await closed.wait()
+    except TimeoutError:
+        pass
+
+
 @router.websocket("/ws/{orch_id}/{server_uid}")
 async def websocket_console(
     websocket: WebSocket,
@@ -89,21 +98,8 @@ async def websocket_console(
         return
     
     try:
-        payload = decode_token(token)
-        user_id = payload.get('sub')
-        
-        conn = get_db()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
-        user_row = cursor.fetchone()
-        conn.close()
-        
-        if not user_row:
-            await websocket.send_json({"error": "Invalid user"})
-            await websocket.close()
-            return
-            
-        user = dict(user_row)
+        user = get_user_from_token(token)
+        check_token_scope(user, orch_id)
         
         if not OrchestratorService.check_user_access(user['id'], orch_id, user['role']):
             await websocket.send_json({"error": "Access denied"})
@@ -128,6 +124,10 @@ async def websocket_console(
         "message": "Console stream connected"
     })
     
+    # Pinged in the background; receive_live closes clients that stop answering
+    liveness = Liveness()
+    pinger = asyncio.create_task(ping_loop(websocket))
+    
     try:
         # Attempt to connect to orchestrator's WebSocket for logs
         base_url = resolve_orchestrator_url(orch['base_url'])
@@ -152,13 +152,22 @@ async def websocket_console(
                     async def handle_client():
                         while True:
                             try:
-                                data = await websocket.receive_text()
+                                data = await receive_live(websocket, liveness)
+                                if data is None:
+                                    break
                                 # Forward commands to orchestrator if supported
                                 await orch_ws.send_str(data)
                             except WebSocketDisconnect:
                                 break
                     
-                    await asyncio.gather(relay_from_orch(), handle_client())
+                    # Whichever side ends first ends the relay
+                    tasks = [asyncio.create_task(relay_from_orch()), asyncio.create_task(handle_client())]
+                    try:
+                        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                    finally:
+                        for task in tasks:
+                            task.cancel()
+                        await asyncio.gather(*tasks, return_exceptions=True)
                     
             except Exception:
                 # Orchestrator doesn't support WebSocket logs, use polling fallback
@@ -167,50 +176,58 @@ async def websocket_console(
                     "message": "Real-time streaming not available, using polling mode"
                 })
                 
+                # Watch the client in the background so a disconnect, missed
+                # pongs or idling end polling
+                closed = asyncio.Event()
+                
+                async def watch_client():
+                    try:
+                        while await receive_live(websocket, liveness) is not None:
+                            pass
+                    except Exception:
+                        pass
+                    closed.set()
+                
+                watcher = asyncio.create_task(watch_client())
+                
                 # Poll for logs every 5 seconds
                 last_log_count = 0
-                while True:
-                    try:
-                        # Check if client is still connected
+                try:
+                    while not closed.is_set():
                         try:
-                            await asyncio.wait_for(
-                                websocket.receive_text(),
-                                timeout=0.1
-                            )
-                        except asyncio.TimeoutError:
-                            pass
+                            # Fetch logs
+                            headers = {"X-Api-Key": orch['api_key']}
+                            url = f"{base_url}/api/v1/server/logs/{server_uid}?lines=50"
+                            
+                            async with session.get(url, headers=headers, timeout=10) as response:
+                                if response.status == 200:
+                                    data = await response.json()
+                                    logs = data.get('logs', [])
+                                    
+                                    if len(logs) > last_log_count:
+                                        # Send only new logs
+                                        new_logs = logs[last_log_count:] if last_log_count > 0 else logs[-20:]
+                                        for log in new_logs:
+                                            await websocket.send_json({
+                                                "type": "log",
+                                                "data": log
+                                            })
+                                        last_log_count = len(logs)
+                            
+                            await _wait_closed(closed, 5)
+                            
                         except WebSocketDisconnect:
                             break
-                        
-                        # Fetch logs
-                        headers = {"X-Api-Key": orch['api_key']}
-                        url = f"{base_url}/api/v1/server/logs/{server_uid}?lines=50"
-                        
-                        async with session.get(url, headers=headers, timeout=10) as response:
-                            if response.status == 200:
-                                data = await response.json()
-                                logs = data.get('logs', [])
-                                
-                                if len(logs) > last_log_count:
-                                    # Send only new logs
-                                    new_logs = logs[last_log_count:] if last_log_count > 0 else logs[-20:]
-                                    for log in new_logs:
-                                        await websocket.send_json({
-                                            "type": "log",
-                                            "data": log
-                                        })
-                                    last_log_count = len(logs)
-                        
-                        await asyncio.sleep(5)
-                        
-                    except WebSocketDisconnect:
-                        break
-                    except Exception as e:
-                        await websocket.send_json({
-                            "type": "error",
-                            "message": f"Log fetch error: {str(e)}"
-                        })
-                        await asyncio.sleep(10)
+                        except Exception as e:
+                            if closed.is_set():
+                                break
+                            await websocket.send_json({
+                                "type": "error",
+                                "message": f"Log fetch error: {str(e)}"
+                            })
+                            await _wait_closed(closed, 10)
+                finally:
+                    watcher.cancel()
                         
     except WebSocketDisconnect:
         pass
@@ -220,6 +237,7 @@ async def websocket_console(
         except Exception:
             pass
     finally:
+        pinger.cancel()
         try:
             await websocket.close()
         except Exception:
@@ -3,7 +3,7 @@ import uuid
 from datetime import datetime, timezone
 
 from core.database import get_db, dict_from_row
-from core.security import get_current_user, get_current_admin_user
+from core.security import get_current_user, get_current_admin_user, in_token_scope
 from models.orchestrator import OrchestratorCreate, OrchestratorUpdate
 from services.orchestrator import OrchestratorService
 from services.audit import AuditService
@@ -13,7 +13,10 @@ router = APIRouter(prefix="/orchestrators")
 @router.get("")
 async def get_orchestrators(current_user: dict = Depends(get_current_user)):
     """Get all orchestrators accessible to the current user"""
-    orchestrators = OrchestratorService.get_all(current_user['id'], current_user['role'])
+    orchestrators = [
+        orch for orch in OrchestratorService.get_all(current_user['id'], current_user['role'])
+        if in_token_scope(current_user, orch['id'])
+    ]
     
     # Remove api_key from response for non-admins
     if current_user['role'] != 'admin':
@@ -7,16 +7,15 @@ import os
 import asyncio
 import aiohttp
 from urllib.parse import quote_plus
-from datetime import datetime, timezone
 from pydantic import BaseModel
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
-from core.database import get_db, dict_from_row
-from core.security import get_current_user, get_current_admin_user, decode_token
+from core.security import get_current_user, get_current_admin_user, get_user_from_token, check_token_scope
 from core.orchestrator_url import resolve_orchestrator_url, resolve_orchestrator_url_candidates
 from services.orchestrator import OrchestratorService
 from services.audit import AuditService
 from services.game_logos import ensure_logo_for_game
+from services.server_cache import ServerCacheService
 
 router = APIRouter(prefix="/proxy")
 docs_security = HTTPBearer(auto_error=False)
@@ -32,27 +31,16 @@ class UpdateServerRequest(BaseModel):
 
 def _resolve_docs_user(
     token: Optional[str],
-    credentials: Optional[HTTPAuthorizationCredentials]
+    credentials: Optional[HTTPAuthorizationCredentials],
+    orch_id: str
 ) -> dict:
     bearer_token = token or (credentials.credentials if credentials else None)
     if not bearer_token:
         raise HTTPException(status_code=401, detail="Missing authentication token")
 
-    payload = decode_token(bearer_token)
-    user_id = payload.get("sub")
-    if not user_id:
-        raise HTTPException(status_code=401, detail="Invalid token")
-
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
-    user = cursor.fetchone()
-    conn.close()
-
-    if not user:
-        raise HTTPException(status_code=401, detail="User not found")
-
-    return dict_from_row(user)
+    user = get_user_from_token(bearer_token)
+    check_token_scope(user, orch_id)
+    return user
 
 
 @router.get("/{orch_id}/openapi.json")
@@ -62,7 +50,7 @@ async def get_orchestrator_openapi(
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(docs_security),
 ):
     """Return OpenAPI spec from a specific orchestrator."""
-    current_user = _resolve_docs_user(token, credentials)
+    current_user = _resolve_docs_user(token, credentials, orch_id)
     if not OrchestratorService.check_user_access(current_user['id'], orch_id, current_user['role']):
         raise HTTPException(status_code=403, detail="Access denied")
 
@@ -101,7 +89,7 @@ async def get_orchestrator_swagger_ui(
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(docs_security),
 ):
     """Serve Swagger UI for a specific orchestrator through the WebUI sub-path."""
-    current_user = _resolve_docs_user(token, credentials)
+    current_user = _resolve_docs_user(token, credentials, orch_id)
     if not OrchestratorService.check_user_access(current_user['id'], orch_id, current_user['role']):
         raise HTTPException(status_code=403, detail="Access denied")
 
@@ -137,7 +125,7 @@ async def get_plans(current_user: dict = Depends(get_current_user)):
 
 @router.get("/{orch_id}/servers")
 async def get_servers(orch_id: str, current_user: dict = Depends(get_current_user)):
-    """Get servers from specific orchestrator (live fetch)"""
+    """Get servers from specific orchestrator (live fetch, shared for a few seconds)"""
     if not OrchestratorService.check_user_access(current_user['id'], orch_id, current_user['role']):
         raise HTTPException(status_code=403, detail="Access denied to this orchestrator")
     
@@ -145,6 +133,12 @@ async def get_servers(orch_id: str, current_user: dict = Depends(get_current_use
     if not orch or not orch.get('is_active'):
         raise HTTPException(status_code=404, detail="Orchestrator not found or inactive")
     
+    # Users polling the same orchestrator share one live fetch per snapshot age
+    snapshot = ServerCacheService.fresh_snapshot(orch_id)
+    if snapshot is not None:
+        servers = ServerCacheService.visible_servers(current_user['id'], current_user['role'], orch_id, snapshot)
+        return {"servers": servers, "last_synced": snapshot.synced_at}
+    
     try:
         timeout = aiohttp.ClientTimeout(total=120, connect=10, sock_read=110)
         async with aiohttp.ClientSession(timeout=timeout) as session:
@@ -159,27 +153,11 @@ async def get_servers(orch_id: str, current_user: dict = Depends(get_current_use
                         if response.status == 200:
                             servers = await response.json()
 
-                            # Filter servers for non-admin users
-                            if current_user['role'] != 'admin':
-                                allowed_servers = OrchestratorService.get_user_server_links(current_user['id'], orch_id)
-                                if allowed_servers:  # If user has specific server links, filter
-                                    servers = [s for s in servers if f"{s.get('game_uid')}.{s.get('servername')}" in allowed_servers]
-
-                            # Update cache
-                            conn = get_db()
-                            cursor = conn.cursor()
-                            now = datetime.now(timezone.utc).isoformat()
-
-                            cursor.execute("DELETE FROM cached_servers WHERE orchestrator_id = ?", (orch_id,))
-                            for server in servers:
-                                server_id = f"{orch_id}_{server.get('game_uid', '')}_{server.get('servername', '')}"
-                                cursor.execute(
-                                    "INSERT INTO cached_servers (id, orchestrator_id, server_data, synced_at) VALUES (?, ?, ?, ?)",
-                                    (server_id, orch_id, json.dumps(server), now)
-                                )
-                            cursor.execute("UPDATE orchestrators SET last_synced = ? WHERE id = ?", (now, orch_id))
-                            conn.commit()
-                            conn.close()
+                            # Update the shared, unfiltered snapshot
+                            now = ServerCacheService.replace_servers(orch_id, servers)
+
+                            # Filter servers for non-admin users at read time
+                            servers = ServerCacheService.visible_servers(current_user['id'], current_user['role'], orch_id)
 
                             return {"servers": servers, "last_synced": now}
 
@@ -308,6 +286,8 @@ async def deploy_server(
                 result = await response.json()
                 
                 if response.status in [200, 201]:
+                    ServerCacheService.expire_snapshot(orch_id)
+                    
                     # Log deployment
                     AuditService.log(
                         user_id=current_user['id'],
@@ -377,6 +357,7 @@ async def server_action(
                             result = {"result": await response.text()}
 
                         if response.status == 200:
+                            ServerCacheService.expire_snapshot(orch_id)
                             AuditService.log(
                                 user_id=current_user['id'],
                                 username=current_user['username'],
@@ -450,6 +431,8 @@ async def proxy_orchestrator(
                 headers=headers,
                 json=body if body else None
             ) as response:
+                if request.method != "GET":
+                    ServerCacheService.expire_snapshot(orch_id)
                 try:
                     return await response.json()
                 except Exception:
@@ -0,0 +1,30 @@
+from fastapi import APIRouter, Depends, Query
+from typing import Optional
+
+from core.security import get_current_user
+from services.server_cache import ServerCacheService
+
+router = APIRouter(prefix="/servers")
+
+@router.get("/search")
+async def search_servers(
+    game: Optional[str] = Query(None),
+    state: Optional[str] = Query(None),
+    name: Optional[str] = Query(None),
+    orchestrator_id: Optional[str] = Query(None),
+    limit: int = Query(100, le=500),
+    offset: int = Query(0, ge=0),
+    current_user: dict = Depends(get_current_user)
+):
+    """Search cached servers across all accessible orchestrators"""
+    return ServerCacheService.search(
+        user_id=current_user['id'],
+        role=current_user['role'],
+        game=game,
+        state=state,
+        name=name,
+        orchestrator_id=orchestrator_id,
+        orchestrator_ids=current_user.get('token_orchestrator_ids'),
+        limit=limit,
+        offset=offset
+    )
@@ -4,7 +4,7 @@ from datetime import datetime, timezone
 from typing import Optional
 
 from core.database import get_db, dict_from_row
-from core.security import get_current_user, get_current_moderator_user
+from core.security import get_current_user, get_current_moderator_user, check_token_scope, in_token_scope
 from models.session import SessionCreate, SessionUpdate
 from services.audit import AuditService
 from services.features import FeatureService
@@ -41,6 +41,8 @@ async def get_sessions(
     
     for row in cursor.fetchall():
         session = dict_from_row(row)
+        if not in_token_scope(current_user, session['orchestrator_id']):
+            continue
         
         # Get RSVPs for this session
         cursor.execute('''
@@ -65,6 +67,7 @@ async def create_session(
     """Create a new gaming session"""
     if not FeatureService.is_enabled('gaming_sessions'):
         raise HTTPException(status_code=403, detail="Gaming sessions are disabled")
+    check_token_scope(current_user, session_data.orchestrator_id)
     
     conn = get_db()
     cursor = conn.cursor()
@@ -124,6 +127,9 @@ async def update_session(
     if not session:
         conn.close()
         raise HTTPException(status_code=404, detail="Session not found")
+    if not in_token_scope(current_user, session['orchestrator_id']):
+        conn.close()
+        raise HTTPException(status_code=403, detail="API token is not scoped to this orchestrator")
     
     updates = {k: v for k, v in session_data.model_dump().items() if v is not None}
     if not updates:
@@ -171,6 +177,9 @@ async def delete_session(
         raise HTTPException(status_code=404, detail="Session not found")
     
     session_dict = dict_from_row(session)
+    if not in_token_scope(current_user, session_dict['orchestrator_id']):
+        conn.close()
+        raise HTTPException(status_code=403, detail="API token is not scoped to this orchestrator")
     
     # Only creator or moderator/admin can delete
     if session_dict['created_by'] != current_user['id'] and current_user['role'] not in ['admin', 'moderator']:
@@ -4,7 +4,7 @@ import uuid
 from datetime import datetime, timezone
 
 from core.database import get_db, dict_from_row, init_db
-from core.security import get_password_hash, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
+from core.security import get_password_hash_async, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
 from models.system import SystemStatus, AdminWizardComplete, FeatureFlags
 from services.features import FeatureService
 from services.audit import AuditService
@@ -50,7 +50,7 @@ async def complete_wizard(wizard_data: AdminWizardComplete):
     
     # Create admin user
     admin_id = str(uuid.uuid4())
-    password_hash = get_password_hash(wizard_data.admin_password)
+    password_hash = await get_password_hash_async(wizard_data.admin_password)
     now = datetime.now(timezone.utc).isoformat()
     
     cursor.execute('''
@@ -10,15 +10,20 @@ import asyncio
 import aiohttp
 import json
 import logging
-from datetime import datetime, timezone
 
 # Core imports
-from core.config import setup_logging, CORS_ORIGINS, SYNC_INTERVAL
+from core.config import setup_logging, CORS_ORIGINS, SYNC_INTERVAL, RETENTION_INTERVAL, API_TOKEN_USAGE_FLUSH_INTERVAL
 from core.database import init_db, get_db, dict_from_row
-from core.security import decode_token
-from core.websocket import chat_manager
+from core.security import get_user_from_token, load_revoked_tokens, password_executor
+from core.api_tokens import api_token_usage
+from core.websocket import chat_manager, encode_message, GLOBAL_CHANNEL
 from core.orchestrator_url import resolve_orchestrator_url, resolve_orchestrator_url_candidates
 from services.test_seed import ensure_test_users
+from services.audit import audit_writer
+from services.acl import access_index
+from services.retention import RetentionService
+from services.chat import ChatService, chat_history, chat_writer
+from services.server_cache import ServerCacheService
 from services.game_logos import resolve_logo_path
 
 # Routes
@@ -54,28 +59,8 @@ async def sync_orchestrator_servers():
                                     if response.status == 200:
                                         servers = await response.json()
 
-                                        conn = get_db()
-                                        cursor = conn.cursor()
-
-                                        # Clear old cache
-                                        cursor.execute("DELETE FROM cached_servers WHERE orchestrator_id = ?",
-                                                     (orch_dict['id'],))
-
-                                        # Insert new cache
-                                        for server in servers:
-                                            server_id = f"{orch_dict['id']}_{server.get('game_uid', '')}_{server.get('servername', '')}"
-                                            cursor.execute(
-                                                "INSERT INTO cached_servers (id, orchestrator_id, server_data, synced_at) VALUES (?, ?, ?, ?)",
-                                                (server_id, orch_dict['id'], json.dumps(server), datetime.now(timezone.utc).isoformat())
-                                            )
-
-                                        cursor.execute(
-                                            "UPDATE orchestrators SET last_synced = ? WHERE id = ?",
-                                            (datetime.now(timezone.utc).isoformat(), orch_dict['id'])
-                                        )
-
-                                        conn.commit()
-                                        conn.close()
+                                        # Replace cached snapshot for this orchestrator
+                                        ServerCacheService.replace_servers(orch_dict['id'], servers)
 
                                         logger.info(f"Synced {len(servers)} servers from {orch_dict['name']}")
                                         break
@@ -86,6 +71,30 @@ async def sync_orchestrator_servers():
         except Exception as e:
             logger.error(f"Error in sync task: {e}")
 
+# Background retention task
+async def enforce_retention_policies():
+    """Background task to archive expired chat/audit rows and compact the database"""
+    while True:
+        try:
+            await asyncio.sleep(RETENTION_INTERVAL)
+            await asyncio.to_thread(RetentionService.run)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error in retention task: {e}")
+
+# Background API token usage write-back
+async def flush_api_token_usage():
+    """Background task to write coalesced API token last-used timestamps"""
+    while True:
+        try:
+            await asyncio.sleep(API_TOKEN_USAGE_FLUSH_INTERVAL)
+            await asyncio.to_thread(api_token_usage.flush)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error in API token usage task: {e}")
+
 # Lifespan context manager
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -95,19 +104,51 @@ async def lifespan(app: FastAPI):
     ensure_test_users()
     logger.info("Database initialized")
     
+    # Build in-memory access index, token revocation set and chat history
+    access_index.load()
+    load_revoked_tokens()
+    chat_history.load()
+    chat_manager.add_listener(chat_history.apply)
+    
+    # Start write-behind audit and chat writers
+    audit_writer.start()
+    chat_writer.start()
+    
+    # Join the broadcast bus shared with other workers
+    await chat_manager.start()
+    
     # Start background sync task
     task = asyncio.create_task(sync_orchestrator_servers())
     logger.info("Background sync task started")
     
+    # Start background retention task
+    retention_task = asyncio.create_task(enforce_retention_policies())
+    logger.info("Background retention task started")
+    
+    # Start background API token usage task
+    usage_task = asyncio.create_task(flush_api_token_usage())
+    
     yield
     
     # Shutdown
-    task.cancel()
-    try:
-        await task
-    except asyncio.CancelledError:
-        pass
-    logger.info("Background sync task stopped")
+    for background_task in (task, retention_task, usage_task):
+        background_task.cancel()
+        try:
+            await background_task
+        except asyncio.CancelledError:
+            pass
+    logger.info("Background tasks stopped")
+    
+    api_token_usage.flush()
+    
+    await chat_manager.stop()
+    
+    # Flush queued audit entries and chat messages before exiting
+    await audit_writer.stop()
+    await chat_writer.stop()
+    logger.info("Audit writer stopped")
+    
+    password_executor.shutdown(wait=False, cancel_futures=True)
 
 # Create the main app
 app = FastAPI(
@@ -156,105 +197,76 @@ async def websocket_chat(websocket: WebSocket, token: str = Query(...)):
     """WebSocket endpoint for real-time chat"""
     # Validate token
     try:
-        payload = decode_token(token)
-        user_id = payload.get("sub")
-        if not user_id:
-            await websocket.close(code=4001, reason="Invalid token")
-            return
-        
-        # Get user info
-        conn = get_db()
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, username, role, is_chat_banned FROM users WHERE id = ?", (user_id,))
-        user_row = cursor.fetchone()
-        conn.close()
-        
-        if not user_row:
-            await websocket.close(code=4001, reason="User not found")
-            return
-        
-        user = dict_from_row(user_row)
+        user = get_user_from_token(token)
         
         if user.get('is_chat_banned'):
             await websocket.close(code=4003, reason="Banned from chat")
             return
         
+    except HTTPException as e:
+        await websocket.close(code=4001, reason=e.detail)
+        return
     except Exception as e:
         logger.error(f"WebSocket auth error: {e}")
         await websocket.close(code=4001, reason="Invalid token")
         return
     
-    await chat_manager.connect(websocket, user_id)
-    
-    # Broadcast user online
-    await chat_manager.broadcast({
-        "type": "user_online",
-        "user": {"id": user_id, "username": user['username']}
-    })
+    # Announces the user online if this is their first connection
+    connection = await chat_manager.connect(websocket, user)
     
     try:
         # Send chat history on connect
-        conn = get_db()
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT m.id, m.message, m.created_at, u.id as user_id, u.username
-            FROM chat_messages m
-            JOIN users u ON m.user_id = u.id
-            ORDER BY m.created_at DESC
-            LIMIT 50
-        """)
-        messages = [dict_from_row(row) for row in cursor.fetchall()]
-        conn.close()
-        
-        await websocket.send_json({
+        await chat_writer.flush_async()
+        connection.enqueue(encode_message({
             "type": "chat_history",
-            "messages": list(reversed(messages))
-        })
+            "channel": GLOBAL_CHANNEL,
+            "messages": ChatService.get_recent_messages(50)
+        }))
         
-        # Listen for incoming messages
+        # Listen for incoming messages; pongs are consumed by receive
         while True:
-            data = await websocket.receive_json()
+            text = await chat_manager.receive(connection)
+            if text is None:
+                break  # Closed for missing pongs or idling
+            data = json.loads(text)
             
             if data.get("type") == "chat_message":
                 message = data.get("message", "").strip()
-                if message and len(message) <= 1000:
-                    # Save to database
-                    conn = get_db()
-                    cursor = conn.cursor()
-                    
-                    import uuid
-                    msg_id = str(uuid.uuid4())
-                    now = datetime.now(timezone.utc).isoformat()
-                    
-                    cursor.execute(
-                        "INSERT INTO chat_messages (id, user_id, message, created_at) VALUES (?, ?, ?, ?)",
-                        (msg_id, user_id, message, now)
-                    )
-                    conn.commit()
-                    conn.close()
-                    
-                    # Broadcast to all clients
+                channel = data.get("channel", GLOBAL_CHANNEL)
+                if channel not in connection.channels:
+                    connection.enqueue(encode_message({"type": "error", "detail": "Not subscribed to this channel"}))
+                elif message and len(message) <= 1000:
+                    # Stored by the chat writer; the broadcast does not wait for the commit
                     await chat_manager.broadcast({
                         "type": "chat_message",
-                        "message": {
-                            "id": msg_id,
-                            "message": message,
-                            "created_at": now,
-                            "user_id": user_id,
-                            "username": user['username']
-                        }
-                    })
+                        "message": ChatService.post_message(user, message, channel)
+                    }, channel)
+            
+            elif data.get("type") == "subscribe":
+                channel = data.get("channel")
+                if not ChatService.can_access_channel(user, channel):
+                    connection.enqueue(encode_message({"type": "error", "detail": "No access to this channel"}))
+                    continue
+                chat_manager.subscribe(connection, channel)
+                await chat_writer.flush_async()
+                connection.enqueue(encode_message({
+                    "type": "subscribed",
+                    "channel": channel,
+                    "messages": ChatService.get_recent_messages(50, channel)
+                }))
+            
+            elif data.get("type") == "unsubscribe":
+                channel = data.get("channel")
+                chat_manager.unsubscribe(connection, channel)
+                connection.enqueue(encode_message({"type": "unsubscribed", "channel": channel}))
                     
     except WebSocketDisconnect:
-        chat_manager.disconnect(user_id)
-        # Broadcast user offline
-        await chat_manager.broadcast({
-            "type": "user_offline",
-            "user_id": user_id
-        })
+        pass
     except Exception as e:
         logger.error(f"WebSocket error: {e}")
-        chat_manager.disconnect(user_id)
+    finally:
+        # Announces the user offline if this was their last connection
+        chat_manager.disconnect(connection)
 
 # CORS middleware
 app.add_middleware(
@@ -263,6 +275,7 @@ app.add_middleware(
     allow_origins=CORS_ORIGINS,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Total-Count"],
 )
 
 if __name__ == "__main__":
@@ -1,4 +1,11 @@
-from .audit import AuditService
+from .audit import AuditService, audit_writer
+from .acl import AccessIndex, access_index
+from .access import AccessService
 from .features import FeatureService
 from .user import UserService
+from .user_import import UserImportService
 from .orchestrator import OrchestratorService
+from .retention import RetentionService
+from .chat import ChatService, ChatHistory, ChatWriter, chat_history, chat_writer
+from .server_cache import ServerCacheService
+from .api_tokens import ApiTokenService
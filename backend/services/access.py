@@ -0,0 +1,107 @@
+import uuid
+from datetime import datetime, timezone
+from typing import List, Optional
+from core.database import get_db
+from services.acl import access_index
+
+class AccessService:
+    """Service for bulk administration of orchestrator and server access links"""
+
+    @staticmethod
+    def _existing_ids(cursor, table: str, ids: set) -> set:
+        if not ids:
+            return set()
+        ids = list(ids)
+        placeholders = ','.join('?' for _ in ids)
+        cursor.execute(f"SELECT id FROM {table} WHERE id IN ({placeholders})", ids)
+        return {row[0] for row in cursor.fetchall()}
+
+    @staticmethod
+    def _is_linked(user_id: str, orch_id: str, server_uid: Optional[str] = None) -> bool:
+        if server_uid:
+            return server_uid in access_index.server_uids(user_id, orch_id)
+        return access_index.has_orchestrator(user_id, orch_id)
+
+    @staticmethod
+    def apply_bulk(add: List[dict], remove: List[dict]) -> List[dict]:
+        """Add and remove many links in one transaction.
+
+        Each link has user_id and orchestrator_id, plus server_uid (and
+        permissions) for server links. Additions are applied before removals.
+        Returns one result per link, in order, with a status of added, exists,
+        removed, not_found or invalid.
+        """
+        now = datetime.now(timezone.utc).isoformat()
+
+        conn = get_db()
+        cursor = conn.cursor()
+        users = AccessService._existing_ids(cursor, 'users', {link['user_id'] for link in add})
+        orchestrators = AccessService._existing_ids(cursor, 'orchestrators', {link['orchestrator_id'] for link in add})
+
+        results = []
+        orch_inserts, server_inserts, orch_deletes, server_deletes = [], [], [], []
+        index_ops = []
+        # Links already touched by this request, so duplicates report correctly
+        added, removed = set(), set()
+
+        for link in add:
+            user_id, orch_id, server_uid = link['user_id'], link['orchestrator_id'], link.get('server_uid')
+            key = (user_id, orch_id, server_uid)
+            if user_id not in users or orch_id not in orchestrators:
+                status = 'invalid'
+            elif key in added or AccessService._is_linked(*key):
+                status = 'exists'
+            else:
+                status = 'added'
+                added.add(key)
+                if server_uid:
+                    server_inserts.append((str(uuid.uuid4()), user_id, orch_id, server_uid, link.get('permissions') or 'read', now))
+                    index_ops.append((access_index.add_server, (user_id, orch_id, server_uid)))
+                else:
+                    orch_inserts.append((str(uuid.uuid4()), user_id, orch_id, now))
+                    index_ops.append((access_index.add_orchestrator, (user_id, orch_id)))
+            results.append({'action': 'add', **link, 'status': status})
+
+        for link in remove:
+            user_id, orch_id, server_uid = link['user_id'], link['orchestrator_id'], link.get('server_uid')
+            key = (user_id, orch_id, server_uid)
+            if key in removed or not (key in added or AccessService._is_linked(*key)):
+                status = 'not_found'
+            else:
+                status = 'removed'
+                removed.add(key)
+                if server_uid:
+                    server_deletes.append((user_id, orch_id, server_uid))
+                    index_ops.append((access_index.remove_server, (user_id, orch_id, server_uid)))
+                else:
+                    orch_deletes.append((user_id, orch_id))
+                    index_ops.append((access_index.remove_orchestrator, (user_id, orch_id)))
+            results.append({'action': 'remove', **link, 'status': status})
+
+        try:
+            cursor.executemany('''
+                INSERT OR IGNORE INTO user_orchestrator_access (id, user_id, orchestrator_id, created_at)
+                VALUES (?, ?, ?, ?)
+            ''', orch_inserts)
+            cursor.executemany('''
+                INSERT OR IGNORE INTO server_links (id, user_id, orchestrator_id, server_uid, permissions, created_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', server_inserts)
+            cursor.executemany('''
+                DELETE FROM user_orchestrator_access WHERE user_id = ? AND orchestrator_id = ?
+            ''', orch_deletes)
+            cursor.executemany('''
+                DELETE FROM server_links WHERE user_id = ? AND orchestrator_id = ? AND server_uid = ?
+            ''', server_deletes)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+        # Mirror the committed changes in the index, in request order
+        for op, args in index_ops:
+            op(*args)
+
+        return results
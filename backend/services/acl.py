@@ -0,0 +1,134 @@
+import logging
+import threading
+from typing import Dict, FrozenSet, Tuple
+from core.database import get_db
+from core.invalidation import invalidations
+
+logger = logging.getLogger(__name__)
+
+EMPTY: FrozenSet[str] = frozenset()
+
+class AccessIndex:
+    """In-memory index of orchestrator and server access links.
+
+    Holds user -> frozenset of orchestrator ids and (user, orchestrator) ->
+    frozenset of server UIDs. Sets are replaced rather than mutated, so
+    lookups never take a lock or touch the database; only writers do.
+    Other workers are told to reload after every change.
+    """
+
+    def __init__(self):
+        self._orchestrators: Dict[str, FrozenSet[str]] = {}
+        self._servers: Dict[Tuple[str, str], FrozenSet[str]] = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+        self.version = 0
+
+    def load(self):
+        """(Re)build the index from user_orchestrator_access and server_links"""
+        conn = get_db()
+        cursor = conn.cursor()
+
+        orchestrators: Dict[str, set] = {}
+        cursor.execute("SELECT user_id, orchestrator_id FROM user_orchestrator_access")
+        for user_id, orch_id in cursor.fetchall():
+            orchestrators.setdefault(user_id, set()).add(orch_id)
+
+        servers: Dict[Tuple[str, str], set] = {}
+        cursor.execute("SELECT user_id, orchestrator_id, server_uid FROM server_links")
+        for user_id, orch_id, server_uid in cursor.fetchall():
+            servers.setdefault((user_id, orch_id), set()).add(server_uid)
+        conn.close()
+
+        with self._lock:
+            self._orchestrators = {k: frozenset(v) for k, v in orchestrators.items()}
+            self._servers = {k: frozenset(v) for k, v in servers.items()}
+            self._loaded = True
+            self.version += 1
+
+        logger.info(f"Access index loaded: {len(orchestrators)} users, {len(servers)} server link groups")
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.load()
+
+    def expire(self, _key=None):
+        """Reload from the database on next use, after another worker changed the links"""
+        self._loaded = False
+
+    def has_orchestrator(self, user_id: str, orch_id: str) -> bool:
+        """Check if a user is linked to an orchestrator"""
+        self._ensure_loaded()
+        return orch_id in self._orchestrators.get(user_id, EMPTY)
+
+    def orchestrator_ids(self, user_id: str) -> FrozenSet[str]:
+        """Get the orchestrators a user is linked to"""
+        self._ensure_loaded()
+        return self._orchestrators.get(user_id, EMPTY)
+
+    def server_uids(self, user_id: str, orch_id: str) -> FrozenSet[str]:
+        """Get the server UIDs a user is linked to on an orchestrator"""
+        self._ensure_loaded()
+        return self._servers.get((user_id, orch_id), EMPTY)
+
+    def add_orchestrator(self, user_id: str, orch_id: str):
+        with self._lock:
+            self._orchestrators[user_id] = self._orchestrators.get(user_id, EMPTY) | {orch_id}
+            self.version += 1
+        invalidations.announce('access_index')
+
+    def remove_orchestrator(self, user_id: str, orch_id: str):
+        with self._lock:
+            remaining = self._orchestrators.get(user_id, EMPTY) - {orch_id}
+            if remaining:
+                self._orchestrators[user_id] = remaining
+            else:
+                self._orchestrators.pop(user_id, None)
+            self.version += 1
+        invalidations.announce('access_index')
+
+    def add_server(self, user_id: str, orch_id: str, server_uid: str):
+        with self._lock:
+            key = (user_id, orch_id)
+            self._servers[key] = self._servers.get(key, EMPTY) | {server_uid}
+            self.version += 1
+        invalidations.announce('access_index')
+
+    def remove_server(self, user_id: str, orch_id: str, server_uid: str):
+        with self._lock:
+            key = (user_id, orch_id)
+            remaining = self._servers.get(key, EMPTY) - {server_uid}
+            if remaining:
+                self._servers[key] = remaining
+            else:
+                self._servers.pop(key, None)
+            self.version += 1
+        invalidations.announce('access_index')
+
+    def drop_user(self, user_id: str):
+        """Forget every link of a deleted user"""
+        with self._lock:
+            self._orchestrators.pop(user_id, None)
+            for key in [k for k in self._servers if k[0] == user_id]:
+                del self._servers[key]
+            self.version += 1
+        invalidations.announce('access_index')
+
+    def drop_orchestrator(self, orch_id: str):
+        """Forget every link to a deleted orchestrator"""
+        with self._lock:
+            for user_id, orch_ids in list(self._orchestrators.items()):
+                if orch_id in orch_ids:
+                    remaining = orch_ids - {orch_id}
+                    if remaining:
+                        self._orchestrators[user_id] = remaining
+                    else:
+                        del self._orchestrators[user_id]
+            for key in [k for k in self._servers if k[1] == orch_id]:
+                del self._servers[key]
+            self.version += 1
+        invalidations.announce('access_index')
+
+# Global access index instance
+access_index = AccessIndex()
+invalidations.register('access_index', access_index.expire)
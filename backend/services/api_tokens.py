@@ -0,0 +1,84 @@
+import json
+import uuid
+from datetime import datetime, timezone, timedelta
+from typing import Optional, List
+from core.database import get_db, dict_from_row
+from core.api_tokens import generate_api_token, hash_api_token, invalidate_api_token, api_token_usage
+
+class ApiTokenService:
+    """Service for long-lived API tokens used by bots and automation"""
+
+    PUBLIC_COLUMNS = 'id, user_id, name, token_prefix, role, orchestrator_ids, created_at, expires_at, last_used_at, revoked'
+
+    @staticmethod
+    def _to_public(row) -> dict:
+        token = dict_from_row(row)
+        token['orchestrator_ids'] = json.loads(token['orchestrator_ids']) if token['orchestrator_ids'] else None
+        token['revoked'] = bool(token['revoked'])
+        # Usage not yet written back is newer than the stored value
+        token['last_used_at'] = api_token_usage.get(token['id']) or token['last_used_at']
+        return token
+
+    @staticmethod
+    def create(
+        user_id: str,
+        name: str,
+        role: Optional[str] = None,
+        orchestrator_ids: Optional[List[str]] = None,
+        expires_in_days: Optional[int] = None
+    ) -> dict:
+        """Create a token; the plaintext value is only ever returned here"""
+        token_id = str(uuid.uuid4())
+        token = generate_api_token()
+        now = datetime.now(timezone.utc)
+        expires_at = (now + timedelta(days=expires_in_days)).isoformat() if expires_in_days else None
+
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO api_tokens (id, user_id, name, token_prefix, token_hash, role, orchestrator_ids, created_at, expires_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            token_id, user_id, name, token[:12], hash_api_token(token), role,
+            json.dumps(orchestrator_ids) if orchestrator_ids is not None else None,
+            now.isoformat(), expires_at
+        ))
+        conn.commit()
+
+        cursor.execute(f"SELECT {ApiTokenService.PUBLIC_COLUMNS} FROM api_tokens WHERE id = ?", (token_id,))
+        created = ApiTokenService._to_public(cursor.fetchone())
+        conn.close()
+
+        return {**created, 'token': token}
+
+    @staticmethod
+    def get_user_tokens(user_id: str) -> List[dict]:
+        """Get a user's tokens, without secrets"""
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT {ApiTokenService.PUBLIC_COLUMNS} FROM api_tokens
+            WHERE user_id = ?
+            ORDER BY created_at DESC
+        ''', (user_id,))
+        tokens = [ApiTokenService._to_public(row) for row in cursor.fetchall()]
+        conn.close()
+        return tokens
+
+    @staticmethod
+    def revoke(token_id: str, user_id: str) -> bool:
+        """Revoke one of a user's tokens"""
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute("SELECT token_hash FROM api_tokens WHERE id = ? AND user_id = ?", (token_id, user_id))
+        row = cursor.fetchone()
+        if not row:
+            conn.close()
+            return False
+
+        cursor.execute("UPDATE api_tokens SET revoked = 1 WHERE id = ?", (token_id,))
+        conn.commit()
+        conn.close()
+
+        invalidate_api_token(row[0])
+        return True
@@ -1,11 +1,62 @@
 import uuid
 import json
+import logging
+from collections import Counter
 from datetime import datetime, timezone
 from typing import Optional, List
+from core.batching import BatchWriter
 from core.database import get_db, dict_from_row
+from core.pagination import keyset_clause, build_page
+from core.config import AUDIT_FLUSH_INTERVAL, AUDIT_FLUSH_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+# audit_counters rows with this day hold the all-time total of a category
+TOTAL_DAY = ''
+
+
+def count_deltas(entries: List[tuple], sign: int = 1) -> List[tuple]:
+    """Aggregate (category, created_at) pairs into audit_counters deltas"""
+    deltas = Counter()
+    for category, created_at in entries:
+        deltas[(category, TOTAL_DAY)] += sign
+        deltas[(category, created_at[:10])] += sign
+    return [(category, day, delta) for (category, day), delta in deltas.items()]
+
+
+def apply_counter_deltas(conn, deltas: List[tuple]):
+    """Apply counter deltas inside the caller's transaction"""
+    conn.executemany('''
+        INSERT INTO audit_counters (category, day, count) VALUES (?, ?, ?)
+        ON CONFLICT(category, day) DO UPDATE SET count = count + excluded.count
+    ''', deltas)
+    conn.execute("DELETE FROM audit_counters WHERE count <= 0")
+
+
+class AuditWriter(BatchWriter):
+    """Write-behind sink that batches audit entries into few transactions"""
+
+    name = 'audit entries'
+
+    def write(self, conn, batch: List[tuple]):
+        conn.executemany('''
+            INSERT INTO audit_log (id, user_id, username, action_type, category, target_type, target_id, details, ip_address, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', batch)
+        # Counters are maintained in the same transaction as the rows
+        apply_counter_deltas(conn, count_deltas([(entry[4], entry[9]) for entry in batch]))
+
+
+# Global audit writer instance
+audit_writer = AuditWriter(AUDIT_FLUSH_INTERVAL, AUDIT_FLUSH_BATCH_SIZE)
+
 
 class AuditService:
-    """Service for managing audit logs"""
+    """Service for managing audit logs.
+
+    Reads see only committed entries; async callers await
+    ``audit_writer.flush_async()`` first to include queued ones.
+    """
     
     CATEGORIES = ['user', 'server', 'chat', 'session', 'auth', 'system']
     ACTION_TYPES = ['create', 'update', 'delete', 'login', 'logout', 'action', 'ban', 'unban', 'clear']
@@ -21,20 +72,13 @@ class AuditService:
         details: Optional[str] = None,
         ip_address: Optional[str] = None
     ) -> str:
-        """Create an audit log entry"""
-        conn = get_db()
-        cursor = conn.cursor()
-        
+        """Create an audit log entry (persisted asynchronously by the audit writer)"""
         log_id = str(uuid.uuid4())
         now = datetime.now(timezone.utc).isoformat()
         
-        cursor.execute('''
-            INSERT INTO audit_log (id, user_id, username, action_type, category, target_type, target_id, details, ip_address, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (log_id, user_id, username, action_type, category, target_type, target_id, details, ip_address, now))
-        
-        conn.commit()
-        conn.close()
+        audit_writer.enqueue(
+            (log_id, user_id, username, action_type, category, target_type, target_id, details, ip_address, now)
+        )
         
         return log_id
     
@@ -60,7 +104,7 @@ class AuditService:
             query += " AND user_id = ?"
             params.append(user_id)
         
-        query += " ORDER BY created_at DESC LIMIT ? OFFSET ?"
+        query += " ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?"
         params.extend([limit, offset])
         
         cursor.execute(query, params)
@@ -69,19 +113,113 @@ class AuditService:
         
         return logs
     
+    @staticmethod
+    def get_logs_page(
+        category: Optional[str] = None,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        direction: str = 'next',
+        user_id: Optional[str] = None
+    ) -> dict:
+        """Get a newest-first page of audit logs using keyset pagination"""
+        keyset, params, order = keyset_clause(cursor, direction)
+        conditions = [keyset] if keyset else []
+        
+        if category:
+            conditions.append("category = ?")
+            params.append(category)
+        
+        if user_id:
+            conditions.append("user_id = ?")
+            params.append(user_id)
+        
+        query = "SELECT * FROM audit_log"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += f" ORDER BY {order} LIMIT ?"
+        params.append(limit + 1)
+        
+        conn = get_db()
+        rows = [dict_from_row(row) for row in conn.execute(query, params).fetchall()]
+        conn.close()
+        
+        logs, next_cursor, prev_cursor = build_page(rows, limit, cursor, direction)
+        return {
+            "logs": logs,
+            "next_cursor": next_cursor,
+            "prev_cursor": prev_cursor
+        }
+    
     @staticmethod
     def get_log_counts_by_category() -> dict:
-        """Get count of logs per category"""
+        """Get count of logs per category from the maintained counters"""
         conn = get_db()
         cursor = conn.cursor()
         
-        cursor.execute('''
-            SELECT category, COUNT(*) as count 
-            FROM audit_log 
-            GROUP BY category
-        ''')
+        cursor.execute("SELECT category, count FROM audit_counters WHERE day = ?", (TOTAL_DAY,))
         
         counts = {row['category']: row['count'] for row in cursor.fetchall()}
         conn.close()
         
         return counts
+    
+    @staticmethod
+    def get_daily_counts(since: str, category: Optional[str] = None) -> List[dict]:
+        """Get per-day counts per category since a YYYY-MM-DD date"""
+        conn = get_db()
+        cursor = conn.cursor()
+        
+        query = "SELECT category, day, count FROM audit_counters WHERE day >= ?"
+        params = [since]
+        if category:
+            query += " AND category = ?"
+            params.append(category)
+        query += " ORDER BY day, category"
+        
+        cursor.execute(query, params)
+        counts = [dict_from_row(row) for row in cursor.fetchall()]
+        conn.close()
+        
+        return counts
+    
+    @staticmethod
+    def rebuild_counters(dry_run: bool = False) -> dict:
+        """Recompute audit_counters from audit_log and report any drift"""
+        audit_writer.flush()
+        
+        conn = get_db()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT category, substr(created_at, 1, 10) AS day, COUNT(*) AS count
+            FROM audit_log
+            GROUP BY category, day
+        ''')
+        actual = Counter()
+        for row in cursor.fetchall():
+            actual[(row['category'], row['day'])] = row['count']
+            actual[(row['category'], TOTAL_DAY)] += row['count']
+        
+        cursor.execute("SELECT category, day, count FROM audit_counters")
+        stored = {(row['category'], row['day']): row['count'] for row in cursor.fetchall()}
+        
+        drift = [
+            {"category": category, "day": day, "stored": stored.get((category, day), 0), "actual": actual.get((category, day), 0)}
+            for category, day in sorted(set(actual) | set(stored))
+            if stored.get((category, day), 0) != actual.get((category, day), 0)
+        ]
+        
+        if drift and not dry_run:
+            cursor.execute("DELETE FROM audit_counters")
+            cursor.executemany(
+                "INSERT INTO audit_counters (category, day, count) VALUES (?, ?, ?)",
+                [(category, day, count) for (category, day), count in actual.items()]
+            )
+            conn.commit()
+        conn.close()
+        
+        return {
+            "consistent": not drift,
+            "rebuilt": bool(drift) and not dry_run,
+            "drift": drift
+        }
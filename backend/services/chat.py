@@ -0,0 +1,362 @@
+import logging
+import threading
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from typing import Optional, List
+from fastapi import HTTPException
+from core.batching import BatchWriter
+from core.config import CHAT_HISTORY_SIZE, CHAT_FLUSH_INTERVAL, CHAT_FLUSH_LINGER, CHAT_FLUSH_BATCH_SIZE
+from core.database import get_db, dict_from_row
+from core.pagination import keyset_clause, build_page, encode_cursor, decode_cursor
+from core.security import in_token_scope
+from core.websocket import GLOBAL_CHANNEL
+from services.acl import access_index
+from services.orchestrator import OrchestratorService
+
+logger = logging.getLogger(__name__)
+
+HISTORY_QUERY = '''
+    SELECT m.id, m.message, m.created_at, m.channel, u.id as user_id, u.username
+    FROM chat_messages m
+    JOIN users u ON m.user_id = u.id
+    WHERE m.channel = ?
+'''
+
+SEARCH_QUERY = '''
+    SELECT m.id, m.message, m.created_at, m.channel, u.id as user_id, u.username,
+           bm25(chat_messages_fts) as score
+    FROM chat_messages_fts
+    JOIN chat_messages m ON m.seq = chat_messages_fts.rowid
+    JOIN users u ON m.user_id = u.id
+'''
+
+def _match_expression(text: str) -> str:
+    """Quote each search term for FTS5 so input is never parsed as query syntax.
+
+    All terms must match; a term ending in * matches as a prefix.
+    """
+    terms = []
+    for word in text.split():
+        prefix = word.endswith('*')
+        word = word.rstrip('*')
+        if word:
+            terms.append('"' + word.replace('"', '""') + '"' + ('*' if prefix else ''))
+    return ' '.join(terms)
+
+def _position(message: dict) -> tuple:
+    return (message['created_at'], message['id'])
+
+class ChatWriter(BatchWriter):
+    """Group-commits chat messages from all senders, a few milliseconds at a time"""
+
+    name = 'chat messages'
+
+    def write(self, conn, batch: List[tuple]):
+        conn.executemany(
+            # seq is the search index key; writers are serialised, so MAX + 1 is unique
+            "INSERT OR IGNORE INTO chat_messages (id, user_id, message, created_at, channel, seq) "
+            "VALUES (?, ?, ?, ?, ?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM chat_messages))",
+            batch
+        )
+
+# Global chat writer instance
+chat_writer = ChatWriter(flush_interval=CHAT_FLUSH_INTERVAL, batch_size=CHAT_FLUSH_BATCH_SIZE, linger=CHAT_FLUSH_LINGER)
+
+class ChatHistory:
+    """Bounded in-memory ring of the newest global chat messages, joined with usernames.
+
+    Kept current from chat broadcasts (see ``apply``), so every worker sees
+    the same changes. Reads it cannot answer return None and fall back to
+    the database, as do reads of orchestrator and session channels.
+    """
+
+    def __init__(self, size: int = CHAT_HISTORY_SIZE):
+        self.size = size
+        self._messages: deque = deque(maxlen=size)  # oldest first
+        self._complete = False  # True while the ring holds every stored message
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Warm the ring with the newest stored messages"""
+        chat_writer.flush()
+        conn = get_db()
+        rows = conn.execute(
+            HISTORY_QUERY + " ORDER BY m.created_at DESC, m.id DESC LIMIT ?", (GLOBAL_CHANNEL, self.size)
+        ).fetchall()
+        conn.close()
+
+        with self._lock:
+            self._messages = deque((dict_from_row(row) for row in reversed(rows)), maxlen=self.size)
+            self._complete = len(rows) < self.size
+            self._loaded = True
+        logger.info(f"Chat history loaded: {len(rows)} messages")
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.load()
+
+    def recent(self, limit: int) -> Optional[List[dict]]:
+        """Get the newest messages oldest-first, or None if the ring has too few"""
+        self._ensure_loaded()
+        with self._lock:
+            if limit > len(self._messages) and not self._complete:
+                return None
+            count = min(limit, len(self._messages))
+            return [self._messages[i] for i in range(len(self._messages) - count, len(self._messages))]
+
+    def add(self, message: dict):
+        """Add a newly stored message, keeping the ring in (created_at, id) order"""
+        if message.get('channel', GLOBAL_CHANNEL) != GLOBAL_CHANNEL:
+            return
+        with self._lock:
+            if not self._loaded:
+                return
+            position = _position(message)
+            index = len(self._messages)
+            while index and _position(self._messages[index - 1]) > position:
+                index -= 1
+            if len(self._messages) == self.size:
+                if index == 0:
+                    return  # Older than everything kept
+                self._messages.popleft()
+                self._complete = False
+                index -= 1
+            self._messages.insert(index, message)
+
+    def _keep(self, predicate):
+        with self._lock:
+            self._messages = deque((m for m in self._messages if predicate(m)), maxlen=self.size)
+
+    def remove(self, message_id: str):
+        """Drop a deleted message"""
+        self._keep(lambda m: m['id'] != message_id)
+
+    def remove_user(self, user_id: str):
+        """Drop every message of a user whose history was deleted"""
+        self._keep(lambda m: m['user_id'] != user_id)
+
+    def rename_user(self, user_id: str, username: str):
+        """Show a user's new name on their messages"""
+        with self._lock:
+            self._messages = deque(
+                ({**m, 'username': username} if m['user_id'] == user_id else m for m in self._messages),
+                maxlen=self.size
+            )
+
+    def prune(self, cutoff: str):
+        """Drop messages removed by retention (created before the cutoff)"""
+        self._keep(lambda m: m['created_at'] >= cutoff)
+
+    def clear(self):
+        """Empty the ring after all messages were deleted"""
+        with self._lock:
+            self._messages.clear()
+            self._complete = True
+
+    def apply(self, message: dict):
+        """Apply a chat broadcast to the ring"""
+        kind = message.get('type')
+        if kind == 'chat_message':
+            self.add(message['message'])
+        elif kind == 'message_deleted':
+            self.remove(message['message_id'])
+        elif kind == 'chat_cleared':
+            self.clear()
+        elif kind == 'user_messages_deleted':
+            self.remove_user(message['user_id'])
+        elif kind == 'user_renamed':
+            self.rename_user(message['user_id'], message['username'])
+
+# Global chat history instance
+chat_history = ChatHistory()
+
+class ChatService:
+    """Service for chat history"""
+
+    @staticmethod
+    def can_access_channel(user: dict, channel: str) -> bool:
+        """Check a channel exists and the user may read and post in it.
+
+        Channels are 'global', 'orch:<id>' for an existing orchestrator the
+        user is linked to (admins: any existing one), and 'session:<id>' for
+        an existing gaming session.
+        API tokens are also held to their orchestrator scope.
+        """
+        if channel == GLOBAL_CHANNEL:
+            return True
+        kind, _, target = (channel or '').partition(':')
+        if not target:
+            return False
+        if kind == 'orch':
+            if not (in_token_scope(user, target) and OrchestratorService.check_user_access(user['id'], target, user['role'])):
+                return False
+            conn = get_db()
+            row = conn.execute("SELECT 1 FROM orchestrators WHERE id = ?", (target,)).fetchone()
+            conn.close()
+            return row is not None
+        if kind == 'session':
+            conn = get_db()
+            row = conn.execute("SELECT orchestrator_id FROM gaming_sessions WHERE id = ?", (target,)).fetchone()
+            conn.close()
+            return row is not None and in_token_scope(user, row['orchestrator_id'])
+        return False
+
+    @staticmethod
+    def readable_channels(user: dict) -> Optional[List[str]]:
+        """Get every channel can_access_channel allows, or None when all are allowed"""
+        if user['role'] == 'admin' and user.get('token_orchestrator_ids') is None:
+            return None
+
+        conn = get_db()
+        if user['role'] == 'admin':
+            orch_ids = [row['id'] for row in conn.execute("SELECT id FROM orchestrators").fetchall()]
+        else:
+            orch_ids = access_index.orchestrator_ids(user['id'])
+        sessions = conn.execute("SELECT id, orchestrator_id FROM gaming_sessions").fetchall()
+        conn.close()
+
+        return [
+            GLOBAL_CHANNEL,
+            *(f"orch:{orch_id}" for orch_id in orch_ids if in_token_scope(user, orch_id)),
+            *(f"session:{row['id']}" for row in sessions if in_token_scope(user, row['orchestrator_id']))
+        ]
+
+    @staticmethod
+    def post_message(user: dict, message: str, channel: str = GLOBAL_CHANNEL) -> dict:
+        """Queue a message for storage and return it, ready to broadcast.
+
+        Ids and timestamps are assigned here, in arrival order, so the
+        message can be broadcast before the chat writer commits it.
+        """
+        msg_id = str(uuid.uuid4())
+        now = datetime.now(timezone.utc).isoformat()
+        chat_writer.enqueue((msg_id, user['id'], message, now, channel))
+        return {
+            "id": msg_id,
+            "message": message,
+            "created_at": now,
+            "channel": channel,
+            "user_id": user['id'],
+            "username": user['username']
+        }
+
+    @staticmethod
+    def get_recent_messages(limit: int = 50, channel: str = GLOBAL_CHANNEL) -> List[dict]:
+        """Get the most recent chat messages of a channel in chronological order"""
+        if channel == GLOBAL_CHANNEL:
+            messages = chat_history.recent(limit)
+            if messages is not None:
+                return messages
+        return ChatService.get_history_page(limit=limit, channel=channel)['messages']
+
+    @staticmethod
+    def get_history_page(
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        direction: str = 'next',
+        channel: str = GLOBAL_CHANNEL
+    ) -> dict:
+        """Get a page of chat history using keyset pagination.
+
+        Pages are walked newest-first ('next' goes back in time) but each
+        page is returned in chronological order, ready for display.
+        Queued messages are not flushed here; async callers await
+        ``chat_writer.flush_async()`` first.
+        """
+        keyset, params, order = keyset_clause(cursor, direction, 'm.created_at', 'm.id')
+
+        # The newest page is served from memory when the ring covers it
+        newest = not cursor and direction == 'next' and channel == GLOBAL_CHANNEL
+        rows = chat_history.recent(limit + 1) if newest else None
+        if rows is not None:
+            messages, next_cursor, prev_cursor = build_page(list(reversed(rows)), limit, cursor, direction)
+            return {
+                "messages": list(reversed(messages)),
+                "next_cursor": next_cursor,
+                "prev_cursor": prev_cursor
+            }
+
+        query = HISTORY_QUERY
+        if keyset:
+            query += f" AND {keyset}"
+        query += f" ORDER BY {order} LIMIT ?"
+        params = [channel, *params, limit + 1]
+
+        conn = get_db()
+        rows = [dict_from_row(row) for row in conn.execute(query, params).fetchall()]
+        conn.close()
+
+        messages, next_cursor, prev_cursor = build_page(rows, limit, cursor, direction)
+        return {
+            "messages": list(reversed(messages)),
+            "next_cursor": next_cursor,
+            "prev_cursor": prev_cursor
+        }
+
+    @staticmethod
+    def search(
+        text: str,
+        user_id: Optional[str] = None,
+        channel: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        sort: str = 'relevance',
+        cursor: Optional[str] = None,
+        limit: int = 50,
+        channels: Optional[List[str]] = None
+    ) -> dict:
+        """Full-text search over chat messages, best matches (or newest) first.
+
+        ``channels`` limits the search to those channels when given. Pages are
+        walked forwards only, with keyset cursors over (score, id) for
+        relevance and (created_at, id) for recency.
+        """
+        match = _match_expression(text)
+        if not match:
+            return {"messages": [], "next_cursor": None}
+
+        filters, params = ["chat_messages_fts MATCH ?"], [match]
+        if user_id:
+            filters.append("m.user_id = ?")
+            params.append(user_id)
+        if channel:
+            filters.append("m.channel = ?")
+            params.append(channel)
+        if channels is not None:
+            filters.append(f"m.channel IN ({', '.join('?' * len(channels))})")
+            params.extend(channels)
+        if since:
+            filters.append("m.created_at >= ?")
+            params.append(since)
+        if until:
+            filters.append("m.created_at < ?")
+            params.append(until)
+        query = f"SELECT * FROM ({SEARCH_QUERY} WHERE {' AND '.join(filters)})"
+
+        if sort == 'recent':
+            keyset, keyset_params, order = keyset_clause(cursor, 'next')
+        else:
+            keyset, keyset_params, order = "", [], "score ASC, id ASC"
+            if cursor:
+                score, row_id = decode_cursor(cursor)
+                try:
+                    keyset, keyset_params = "(score, id) > (?, ?)", [float(score), row_id]
+                except ValueError:
+                    raise HTTPException(status_code=400, detail="Invalid cursor")
+        if keyset:
+            query += f" WHERE {keyset}"
+        query += f" ORDER BY {order} LIMIT ?"
+
+        conn = get_db()
+        rows = [dict_from_row(row) for row in conn.execute(query, [*params, *keyset_params, limit + 1]).fetchall()]
+        conn.close()
+
+        if sort == 'recent':
+            messages, next_cursor, _ = build_page(rows, limit, cursor, 'next')
+        else:
+            messages = rows[:limit]
+            last = messages[-1] if len(rows) > limit else None
+            next_cursor = encode_cursor(repr(last['score']), last['id']) if last else None
+        return {"messages": messages, "next_cursor": next_cursor}
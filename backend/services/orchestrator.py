@@ -1,10 +1,12 @@
 import uuid
 from datetime import datetime, timezone
-from typing import Optional, List
+from typing import Optional, List, FrozenSet
 import aiohttp
 import asyncio
 from core.database import get_db, dict_from_row
 from core.orchestrator_url import resolve_orchestrator_url, resolve_orchestrator_url_candidates
+from services.acl import access_index
+from services.server_cache import ServerCacheService
 
 class OrchestratorService:
     """Service for orchestrator management"""
@@ -110,6 +112,8 @@ class OrchestratorService:
         
         conn.commit()
         conn.close()
+        access_index.drop_orchestrator(orch_id)
+        ServerCacheService.drop_snapshot(orch_id)
         return True
     
     @staticmethod
@@ -145,27 +149,9 @@ class OrchestratorService:
         """Check if user has access to orchestrator"""
         if role == 'admin':
             return True
-        
-        conn = get_db()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT id FROM user_orchestrator_access 
-            WHERE user_id = ? AND orchestrator_id = ?
-        ''', (user_id, orch_id))
-        has_access = cursor.fetchone() is not None
-        conn.close()
-        
-        return has_access
+        return access_index.has_orchestrator(user_id, orch_id)
     
     @staticmethod
-    def get_user_server_links(user_id: str, orch_id: str) -> List[str]:
-        """Get list of server UIDs user has access to"""
-        conn = get_db()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT server_uid FROM server_links
-            WHERE user_id = ? AND orchestrator_id = ?
-        ''', (user_id, orch_id))
-        servers = [row[0] for row in cursor.fetchall()]
-        conn.close()
-        return servers
+    def get_user_server_links(user_id: str, orch_id: str) -> FrozenSet[str]:
+        """Get set of server UIDs user has access to"""
+        return access_index.server_uids(user_id, orch_id)
@@ -0,0 +1,232 @@
+import copy
+import gzip
+import json
+import logging
+import os
+from datetime import datetime, timezone, timedelta
+from typing import Optional
+
+from core.database import get_db, dict_from_row, DB_PATH
+from core.config import DEFAULT_RETENTION, RETENTION_BATCH_SIZE, RETENTION_VACUUM_PAGES, ARCHIVE_DIR
+from services.audit import count_deltas, apply_counter_deltas
+from services.chat import chat_history, chat_writer
+
+logger = logging.getLogger(__name__)
+
+class RetentionService:
+    """Service for retention policies, archival and database compaction"""
+
+    CONFIG_KEY = 'retention_policies'
+    TABLES = tuple(DEFAULT_RETENTION.keys())
+
+    @staticmethod
+    def get_policies() -> dict:
+        """Get retention policies merged over the defaults"""
+        conn = get_db()
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT value FROM system_config WHERE key = ?", (RetentionService.CONFIG_KEY,))
+        row = cursor.fetchone()
+        conn.close()
+
+        policies = copy.deepcopy(DEFAULT_RETENTION)
+        if row:
+            for table, policy in json.loads(row[0]).items():
+                if table in policies:
+                    policies[table].update(policy)
+        return policies
+
+    @staticmethod
+    def update_policies(policies: dict) -> dict:
+        """Update retention policies for one or more tables"""
+        current = RetentionService.get_policies()
+        for table, policy in policies.items():
+            if table in current and policy is not None:
+                current[table].update(policy)
+
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT OR REPLACE INTO system_config (key, value)
+            VALUES (?, ?)
+        ''', (RetentionService.CONFIG_KEY, json.dumps(current)))
+        conn.commit()
+        conn.close()
+
+        return current
+
+    @staticmethod
+    def apply_policy(table: str, policy: dict, now: Optional[datetime] = None) -> dict:
+        """Archive and delete expired rows of a table in small batches.
+
+        Every batch is appended to a gzip-compressed JSON-lines archive before
+        it is deleted in its own short transaction, so writers are never
+        blocked for long and nothing is deleted that was not archived.
+        """
+        if table not in RetentionService.TABLES:
+            raise ValueError(f"No retention policy for table: {table}")
+
+        now = now or datetime.now(timezone.utc)
+        cutoff = (now - timedelta(days=policy['days'])).isoformat()
+        if table == 'chat_messages':
+            chat_writer.flush()
+
+        archive = None
+        archive_path = None
+        deleted = 0
+
+        conn = get_db()
+        cursor = conn.cursor()
+        try:
+            while True:
+                cursor.execute(f'''
+                    SELECT rowid AS _rowid, * FROM {table}
+                    WHERE created_at < ?
+                    ORDER BY created_at, id
+                    LIMIT ?
+                ''', (cutoff, RETENTION_BATCH_SIZE))
+                rows = [dict_from_row(row) for row in cursor.fetchall()]
+                if not rows:
+                    break
+
+                rowids = [row.pop('_rowid') for row in rows]
+
+                if policy.get('archive', True):
+                    if archive is None:
+                        ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+                        timestamp = now.strftime("%Y%m%d_%H%M%S")
+                        archive_path = ARCHIVE_DIR / f"{table}_{timestamp}.jsonl.gz"
+                        archive = gzip.open(archive_path, 'at', encoding='utf-8')
+                    archive.writelines(json.dumps(row) + "\n" for row in rows)
+                    archive.flush()
+
+                placeholders = ','.join('?' for _ in rowids)
+                cursor.execute(f"DELETE FROM {table} WHERE rowid IN ({placeholders})", rowids)
+                deleted += cursor.rowcount
+                if table == 'audit_log':
+                    apply_counter_deltas(conn, count_deltas(
+                        [(row['category'], row['created_at']) for row in rows], sign=-1
+                    ))
+                conn.commit()
+
+                if len(rows) < RETENTION_BATCH_SIZE:
+                    break
+        finally:
+            if archive is not None:
+                archive.close()
+            conn.close()
+
+        if deleted:
+            logger.info(f"Retention removed {deleted} rows from {table} older than {cutoff}")
+        if table == 'chat_messages':
+            # Other workers may have deleted the rows, so prune regardless
+            chat_history.prune(cutoff)
+
+        return {
+            "table": table,
+            "cutoff": cutoff,
+            "deleted": deleted,
+            "archive": archive_path.name if archive_path else None
+        }
+
+    @staticmethod
+    def compact(max_pages: int = RETENTION_VACUUM_PAGES) -> int:
+        """Release free pages with incremental vacuum, a chunk at a time.
+
+        Returns the number of pages handed back, measured from the freelist.
+        """
+        conn = get_db()
+        try:
+            before = remaining = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            while remaining:
+                # executescript steps the pragma to completion; execute() frees one page per call
+                conn.executescript(f"PRAGMA incremental_vacuum({int(max_pages)})")
+                now_free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+                if now_free >= remaining:
+                    break
+                remaining = now_free
+        finally:
+            conn.close()
+        return before - remaining
+
+    @staticmethod
+    def enable_incremental_vacuum() -> dict:
+        """Switch an existing database to incremental auto-vacuum.
+
+        Needs a full VACUUM, which rewrites the file under an exclusive lock
+        and temporarily needs about twice its disk space, so it only runs on
+        request. Reports the page counts before and after.
+        """
+        conn = get_db()
+        try:
+            before = conn.execute("PRAGMA page_count").fetchone()[0]
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+                return {"enabled": True, "vacuumed": False, "pages_before": before, "pages_after": before}
+
+            logger.info(f"Vacuuming database ({before} pages) to enable incremental auto-vacuum")
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+            after = conn.execute("PRAGMA page_count").fetchone()[0]
+            enabled = conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+        finally:
+            conn.close()
+        return {"enabled": enabled, "vacuumed": True, "pages_before": before, "pages_after": after}
+
+    @staticmethod
+    def run() -> dict:
+        """Apply every enabled retention policy, then compact the database"""
+        results = []
+        for table, policy in RetentionService.get_policies().items():
+            if policy.get('enabled'):
+                results.append(RetentionService.apply_policy(table, policy))
+
+        return {
+            "results": results,
+            "pages_released": RetentionService.compact()
+        }
+
+    @staticmethod
+    def get_table_stats() -> dict:
+        """Get row counts and on-disk sizes per table"""
+        conn = get_db()
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name")
+        tables = [row[0] for row in cursor.fetchall()]
+
+        # Bytes per table including its indexes (dbstat may not be compiled in)
+        sizes = {}
+        try:
+            cursor.execute('''
+                SELECT m.tbl_name AS name, SUM(s.pgsize) AS bytes
+                FROM dbstat s
+                JOIN sqlite_master m ON s.name = m.name
+                GROUP BY m.tbl_name
+            ''')
+            sizes = {row['name']: row['bytes'] for row in cursor.fetchall()}
+        except Exception:
+            pass
+
+        table_stats = []
+        for table in tables:
+            cursor.execute(f"SELECT COUNT(*) FROM {table}")
+            table_stats.append({
+                "table": table,
+                "rows": cursor.fetchone()[0],
+                "bytes": sizes.get(table)
+            })
+
+        page_size = cursor.execute("PRAGMA page_size").fetchone()[0]
+        page_count = cursor.execute("PRAGMA page_count").fetchone()[0]
+        freelist_count = cursor.execute("PRAGMA freelist_count").fetchone()[0]
+        auto_vacuum = cursor.execute("PRAGMA auto_vacuum").fetchone()[0]
+        conn.close()
+
+        return {
+            "tables": table_stats,
+            "page_size": page_size,
+            "page_count": page_count,
+            "freelist_count": freelist_count,
+            "incremental_vacuum": auto_vacuum == 2,
+            "file_size": os.path.getsize(DB_PATH) if os.path.exists(DB_PATH) else None
+        }
@@ -0,0 +1,243 @@
+import json
+import itertools
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional, List
+from core.database import get_db, dict_from_row
+from core.cache import TTLCache
+from core.config import SERVER_VISIBILITY_CACHE_SIZE, SERVER_SNAPSHOT_MAX_AGE
+from services.acl import access_index
+
+
+def server_uid(server: dict) -> str:
+    """The UID server links refer to a server by"""
+    return f"{server.get('game_uid')}.{server.get('servername')}"
+
+
+class ServerSnapshot:
+    """Unfiltered server list of one orchestrator, in the orchestrator's order.
+
+    ``fetched_at`` is the monotonic time of the live fetch it came from, or
+    0 when it was loaded from the cache table or expired.
+    """
+
+    _versions = itertools.count(1)
+
+    def __init__(self, servers: List[dict], synced_at: Optional[str], fetched_at: float = 0):
+        self.version = next(ServerSnapshot._versions)
+        self.servers = servers
+        self.synced_at = synced_at
+        self.fetched_at = fetched_at
+
+
+# Latest snapshot per orchestrator, shared by every user
+_snapshots: Dict[str, ServerSnapshot] = {}
+_snapshots_lock = threading.Lock()
+
+# Visible server lists keyed by (user, orchestrator, snapshot version, ACL version)
+_visibility_cache = TTLCache(SERVER_VISIBILITY_CACHE_SIZE, 3600)
+
+
+class ServerCacheService:
+    """Service for the cached_servers snapshot of orchestrator servers"""
+
+    # Columns projected out of server_data on write so they can be indexed
+    PROJECTED_COLUMNS = ('game_uid', 'servername', 'container_state', 'players', 'version')
+
+    @staticmethod
+    def project(server: dict) -> tuple:
+        """Extract the indexed columns from an orchestrator server payload"""
+        config = server.get('server_config') or {}
+        players = server.get('players', config.get('players'))
+        try:
+            players = int(players) if players is not None else None
+        except (TypeError, ValueError):
+            players = None
+
+        return (
+            server.get('game_uid'),
+            server.get('servername'),
+            server.get('container_state'),
+            players,
+            server.get('version') or config.get('version')
+        )
+
+    @staticmethod
+    def replace_servers(orch_id: str, servers: List[dict], synced_at: Optional[str] = None) -> str:
+        """Replace the cached servers of an orchestrator in one transaction"""
+        synced_at = synced_at or datetime.now(timezone.utc).isoformat()
+
+        rows = [
+            (
+                f"{orch_id}_{server.get('game_uid', '')}_{server.get('servername', '')}",
+                orch_id,
+                json.dumps(server),
+                synced_at,
+                *ServerCacheService.project(server)
+            )
+            for server in servers
+        ]
+
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM cached_servers WHERE orchestrator_id = ?", (orch_id,))
+        cursor.executemany('''
+            INSERT OR REPLACE INTO cached_servers
+                (id, orchestrator_id, server_data, synced_at, game_uid, servername, container_state, players, version)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+        cursor.execute("UPDATE orchestrators SET last_synced = ? WHERE id = ?", (synced_at, orch_id))
+        conn.commit()
+        conn.close()
+
+        with _snapshots_lock:
+            _snapshots[orch_id] = ServerSnapshot(list(servers), synced_at, time.monotonic())
+
+        return synced_at
+
+    @staticmethod
+    def fresh_snapshot(orch_id: str, max_age: float = SERVER_SNAPSHOT_MAX_AGE) -> Optional[ServerSnapshot]:
+        """Get the shared snapshot if it was fetched live within max_age seconds"""
+        snapshot = _snapshots.get(orch_id)
+        if snapshot is None or time.monotonic() - snapshot.fetched_at >= max_age:
+            return None
+        return snapshot
+
+    @staticmethod
+    def expire_snapshot(orch_id: str):
+        """Make the next server list request fetch live, e.g. after a server action"""
+        snapshot = _snapshots.get(orch_id)
+        if snapshot is not None:
+            snapshot.fetched_at = 0
+
+    @staticmethod
+    def get_snapshot(orch_id: str) -> ServerSnapshot:
+        """Get the shared server snapshot of an orchestrator, loading it from the cache table if needed"""
+        snapshot = _snapshots.get(orch_id)
+        if snapshot is not None:
+            return snapshot
+
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute("SELECT server_data, synced_at FROM cached_servers WHERE orchestrator_id = ?", (orch_id,))
+        rows = cursor.fetchall()
+        conn.close()
+
+        snapshot = ServerSnapshot(
+            [json.loads(row['server_data']) for row in rows],
+            max((row['synced_at'] for row in rows), default=None)
+        )
+        with _snapshots_lock:
+            # A concurrent replace_servers wins over this older view
+            return _snapshots.setdefault(orch_id, snapshot)
+
+    @staticmethod
+    def visible_servers(user_id: str, role: str, orch_id: str, snapshot: Optional[ServerSnapshot] = None) -> List[dict]:
+        """Get the servers of an orchestrator a user may see.
+
+        Admins and users without server links see the whole snapshot; linked
+        users see only their servers, in snapshot order. Results are cached
+        until the snapshot or the access links change.
+        """
+        snapshot = snapshot or ServerCacheService.get_snapshot(orch_id)
+        if role == 'admin':
+            return snapshot.servers
+
+        allowed = access_index.server_uids(user_id, orch_id)
+        if not allowed:
+            return snapshot.servers
+
+        key = (user_id, orch_id, snapshot.version, access_index.version)
+        servers = _visibility_cache.get(key)
+        if servers is None:
+            servers = [server for server in snapshot.servers if server_uid(server) in allowed]
+            _visibility_cache.set(key, servers)
+        return servers
+
+    @staticmethod
+    def drop_snapshot(orch_id: str):
+        """Forget the in-memory snapshot of a deleted orchestrator"""
+        with _snapshots_lock:
+            _snapshots.pop(orch_id, None)
+
+    @staticmethod
+    def search(
+        user_id: str,
+        role: str,
+        game: Optional[str] = None,
+        state: Optional[str] = None,
+        name: Optional[str] = None,
+        orchestrator_id: Optional[str] = None,
+        orchestrator_ids: Optional[List[str]] = None,
+        limit: int = 100,
+        offset: int = 0
+    ) -> List[dict]:
+        """Search cached servers using only the projected, indexed columns.
+
+        Non-admins only see servers of orchestrators they are linked to and,
+        where they have server links on that orchestrator, only those servers.
+        ``orchestrator_ids`` (an API token's scope) narrows the search further.
+        """
+        if orchestrator_ids is not None and not orchestrator_ids:
+            return []
+
+        query = '''
+            SELECT cs.orchestrator_id, o.name AS orchestrator_name, cs.game_uid, cs.servername,
+                   cs.container_state, cs.players, cs.version, cs.synced_at
+            FROM cached_servers cs
+            JOIN orchestrators o ON cs.orchestrator_id = o.id
+            WHERE 1=1
+        '''
+        params = []
+
+        if game:
+            query += " AND cs.game_uid = ?"
+            params.append(game)
+
+        if state:
+            query += " AND cs.container_state = ?"
+            params.append(state)
+
+        if name:
+            query += " AND cs.servername LIKE ?"
+            params.append(f"%{name}%")
+
+        if orchestrator_id:
+            query += " AND cs.orchestrator_id = ?"
+            params.append(orchestrator_id)
+
+        if orchestrator_ids is not None:
+            query += f" AND cs.orchestrator_id IN ({','.join('?' for _ in orchestrator_ids)})"
+            params.extend(orchestrator_ids)
+
+        if role != 'admin':
+            query += '''
+                AND o.is_active = 1
+                AND cs.orchestrator_id IN (
+                    SELECT orchestrator_id FROM user_orchestrator_access WHERE user_id = ?
+                )
+                AND (
+                    NOT EXISTS (
+                        SELECT 1 FROM server_links sl
+                        WHERE sl.user_id = ? AND sl.orchestrator_id = cs.orchestrator_id
+                    )
+                    OR EXISTS (
+                        SELECT 1 FROM server_links sl
+                        WHERE sl.user_id = ? AND sl.orchestrator_id = cs.orchestrator_id
+                          AND sl.server_uid = cs.game_uid || '.' || cs.servername
+                    )
+                )
+            '''
+            params.extend([user_id, user_id, user_id])
+
+        query += " ORDER BY cs.game_uid, cs.servername LIMIT ? OFFSET ?"
+        params.extend([limit, offset])
+
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        servers = [dict_from_row(row) for row in cursor.fetchall()]
+        conn.close()
+
+        return servers
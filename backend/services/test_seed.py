@@ -4,7 +4,7 @@ import uuid
 from datetime import datetime, timezone
 
 from core.database import get_db
-from core.security import get_password_hash
+from core.security import get_password_hash, invalidate_principal
 
 logger = logging.getLogger(__name__)
 
@@ -83,6 +83,7 @@ def ensure_test_users() -> None:
         )
 
         conn.commit()
+        invalidate_principal()
         logger.info(
             "Test seed complete (created=%s, updated=%s).", created, updated
         )
@@ -1,8 +1,10 @@
 import uuid
 from datetime import datetime, timezone
-from typing import Optional, List
+from typing import Optional, List, Tuple
 from core.database import get_db, dict_from_row
-from core.security import get_password_hash, verify_password
+from core.security import get_password_hash_async, invalidate_principal
+from core.api_tokens import invalidate_api_token
+from services.acl import access_index
 
 class UserService:
     """Service for user management"""
@@ -27,44 +29,108 @@ class UserService:
         conn.close()
         return dict_from_row(user) if user else None
     
+    # Columns returned by user listings (never the password hash)
+    LIST_COLUMNS = 'id, username, email, role, is_chat_banned, created_at'
+    SORT_COLUMNS = {
+        'username': 'username COLLATE NOCASE',
+        'created_at': 'created_at',
+        'role': 'role',
+    }
+    
     @staticmethod
     def get_all_users() -> List[dict]:
         """Get all users with their orchestrator access"""
+        return UserService.search_users()[0]
+    
+    @staticmethod
+    def search_users(
+        search: Optional[str] = None,
+        role: Optional[str] = None,
+        sort: str = 'created_at',
+        order: str = 'desc',
+        limit: Optional[int] = None,
+        offset: int = 0
+    ) -> Tuple[List[dict], int]:
+        """Get a page of users with their access links, plus the total match count.
+        
+        Runs a fixed number of queries however many users are returned: the
+        access links of the whole page are fetched with the page query as a
+        subquery instead of once per user.
+        """
+        where = []
+        params = []
+        if search:
+            where.append("(username LIKE ? OR email LIKE ?)")
+            params.extend([f"%{search}%", f"%{search}%"])
+        if role:
+            where.append("role = ?")
+            params.append(role)
+        where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+        
+        direction = 'ASC' if order.lower() == 'asc' else 'DESC'
+        order_sql = f"{UserService.SORT_COLUMNS.get(sort, 'created_at')} {direction}, id {direction}"
+        page_sql = f"SELECT id FROM users {where_sql} ORDER BY {order_sql}"
+        page_params = list(params)
+        if limit is not None:
+            page_sql += " LIMIT ? OFFSET ?"
+            page_params.extend([limit, offset])
+        
         conn = get_db()
         cursor = conn.cursor()
         
-        cursor.execute("SELECT * FROM users ORDER BY created_at DESC")
-        users = []
-        for row in cursor.fetchall():
-            user = dict_from_row(row)
-            # Get orchestrator access
-            cursor.execute('''
-                SELECT o.id, o.name FROM user_orchestrator_access uoa
+        cursor.execute(f"SELECT COUNT(*) FROM users {where_sql}", params)
+        total = cursor.fetchone()[0]
+        
+        cursor.execute(
+            f"SELECT {UserService.LIST_COLUMNS} FROM users WHERE id IN ({page_sql}) ORDER BY {order_sql}",
+            page_params
+        )
+        users = [dict_from_row(row) for row in cursor.fetchall()]
+        by_id = {}
+        for user in users:
+            user['orchestrators'] = []
+            user['server_links'] = []
+            by_id[user['id']] = user
+        
+        if users:
+            cursor.execute(f'''
+                SELECT uoa.user_id, o.id, o.name FROM user_orchestrator_access uoa
                 JOIN orchestrators o ON uoa.orchestrator_id = o.id
-                WHERE uoa.user_id = ?
-            ''', (user['id'],))
-            user['orchestrators'] = [dict_from_row(r) for r in cursor.fetchall()]
-            
-            # Get server links
-            cursor.execute('''
-                SELECT orchestrator_id, server_uid, permissions FROM server_links
-                WHERE user_id = ?
-            ''', (user['id'],))
-            user['server_links'] = [dict_from_row(r) for r in cursor.fetchall()]
+                WHERE uoa.user_id IN ({page_sql})
+            ''', page_params)
+            for row in cursor.fetchall():
+                by_id[row['user_id']]['orchestrators'].append({'id': row['id'], 'name': row['name']})
             
-            users.append(user)
+            cursor.execute(f'''
+                SELECT user_id, orchestrator_id, server_uid, permissions FROM server_links
+                WHERE user_id IN ({page_sql})
+            ''', page_params)
+            for row in cursor.fetchall():
+                link = dict_from_row(row)
+                by_id[link.pop('user_id')]['server_links'].append(link)
         
         conn.close()
-        return users
+        return users, total
     
     @staticmethod
-    def create_user(username: str, email: str, password: str, role: str = 'user') -> dict:
+    def get_role_counts() -> dict:
+        """Get the number of users per role"""
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute("SELECT role, COUNT(*) FROM users GROUP BY role")
+        counts = {row[0]: row[1] for row in cursor.fetchall()}
+        conn.close()
+        return counts
+    
+    @staticmethod
+    async def create_user(username: str, email: str, password: str, role: str = 'user') -> dict:
         """Create a new user"""
+        password_hash = await get_password_hash_async(password)
+        
         conn = get_db()
         cursor = conn.cursor()
         
         user_id = str(uuid.uuid4())
-        password_hash = get_password_hash(password)
         now = datetime.now(timezone.utc).isoformat()
         
         cursor.execute('''
@@ -105,6 +171,7 @@ class UserService:
         values.append(user_id)
         cursor.execute(f"UPDATE users SET {', '.join(fields)} WHERE id = ?", values)
         conn.commit()
+        invalidate_principal(user_id)
         
         # Return updated user
         cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
@@ -114,16 +181,22 @@ class UserService:
         return user
     
     @staticmethod
-    def change_password(user_id: str, new_password: str) -> bool:
+    async def change_password(user_id: str, new_password: str) -> bool:
         """Change user password"""
+        password_hash = await get_password_hash_async(new_password)
+        return UserService.set_password_hash(user_id, password_hash)
+    
+    @staticmethod
+    def set_password_hash(user_id: str, password_hash: str) -> bool:
+        """Store an already computed password hash"""
         conn = get_db()
         cursor = conn.cursor()
         
-        password_hash = get_password_hash(new_password)
         cursor.execute("UPDATE users SET password_hash = ? WHERE id = ?", (password_hash, user_id))
         
         conn.commit()
         conn.close()
+        invalidate_principal(user_id)
         return True
     
     @staticmethod
@@ -136,10 +209,14 @@ class UserService:
         cursor.execute("DELETE FROM user_orchestrator_access WHERE user_id = ?", (user_id,))
         cursor.execute("DELETE FROM server_links WHERE user_id = ?", (user_id,))
         cursor.execute("DELETE FROM session_rsvps WHERE user_id = ?", (user_id,))
+        cursor.execute("DELETE FROM api_tokens WHERE user_id = ?", (user_id,))
         cursor.execute("DELETE FROM users WHERE id = ?", (user_id,))
         
         conn.commit()
         conn.close()
+        access_index.drop_user(user_id)
+        invalidate_api_token()
+        invalidate_principal(user_id)
         return True
     
     @staticmethod
@@ -150,6 +227,7 @@ class UserService:
         cursor.execute("UPDATE users SET is_chat_banned = 1 WHERE id = ?", (user_id,))
         conn.commit()
         conn.close()
+        invalidate_principal(user_id)
         return True
     
     @staticmethod
@@ -160,4 +238,5 @@ class UserService:
         cursor.execute("UPDATE users SET is_chat_banned = 0 WHERE id = ?", (user_id,))
         conn.commit()
         conn.close()
+        invalidate_principal(user_id)
         return True
@@ -0,0 +1,139 @@
+import asyncio
+import csv
+import io
+import json
+import multiprocessing
+import sqlite3
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import AsyncIterator, List, Tuple
+from pydantic import ValidationError
+from core.config import ROLE_PERMISSIONS, USER_IMPORT_WORKERS, USER_IMPORT_BATCH_SIZE
+from core.database import get_db
+from core.security import get_password_hash
+from models.user import UserCreate
+
+# Columns read from each CSV row or JSON object
+IMPORT_FIELDS = ('username', 'email', 'password', 'role')
+
+
+class UserImportService:
+    """Service for bulk user import from CSV or JSON"""
+
+    @staticmethod
+    def parse(content: bytes, filename: str = '') -> List[dict]:
+        """Parse a JSON array of user objects, or CSV with a header row"""
+        text = content.decode('utf-8-sig')
+        if filename.lower().endswith('.json') or text.lstrip().startswith('['):
+            rows = json.loads(text)
+            if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+                raise ValueError("JSON import must be an array of user objects")
+        else:
+            rows = list(csv.DictReader(io.StringIO(text)))
+        return [
+            {field: (str(row[field]).strip() if row.get(field) is not None else None) for field in IMPORT_FIELDS}
+            for row in rows
+        ]
+
+    @staticmethod
+    def validate(rows: List[dict]) -> Tuple[List[Tuple[int, UserCreate]], List[dict]]:
+        """Split rows into valid users and per-row errors.
+
+        Existing usernames and emails are checked with one query each.
+        """
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute("SELECT username, email FROM users")
+        taken_usernames, taken_emails = set(), set()
+        for username, email in cursor.fetchall():
+            taken_usernames.add(username)
+            taken_emails.add(email.lower())
+        conn.close()
+
+        valid, errors = [], []
+        for index, row in enumerate(rows, start=1):
+            try:
+                user = UserCreate(**{k: v for k, v in row.items() if v})
+            except ValidationError as e:
+                fields = ', '.join(str(err['loc'][0]) for err in e.errors())
+                errors.append({"row": index, "username": row.get('username'), "status": "error", "error": f"Invalid fields: {fields}"})
+                continue
+
+            error = None
+            if len(user.password) < 8:
+                error = "Password must be at least 8 characters"
+            elif user.role not in ROLE_PERMISSIONS:
+                error = f"Invalid role: {user.role}"
+            elif user.username in taken_usernames:
+                error = "Username already exists"
+            elif user.email.lower() in taken_emails:
+                error = "Email already exists"
+
+            if error:
+                errors.append({"row": index, "username": user.username, "status": "error", "error": error})
+                continue
+
+            taken_usernames.add(user.username)
+            taken_emails.add(user.email.lower())
+            valid.append((index, user))
+
+        return valid, errors
+
+    @staticmethod
+    def insert_batch(batch: List[Tuple[int, UserCreate, str]]) -> List[dict]:
+        """Insert hashed users in one transaction, reporting each row"""
+        now = datetime.now(timezone.utc).isoformat()
+        results = []
+
+        conn = get_db()
+        cursor = conn.cursor()
+        for index, user, password_hash in batch:
+            user_id = str(uuid.uuid4())
+            try:
+                cursor.execute('''
+                    INSERT INTO users (id, username, email, password_hash, role, is_chat_banned, created_at)
+                    VALUES (?, ?, ?, ?, ?, 0, ?)
+                ''', (user_id, user.username, user.email, password_hash, user.role, now))
+                results.append({"row": index, "username": user.username, "status": "created", "id": user_id})
+            except sqlite3.IntegrityError:
+                # Lost a race with a concurrent create
+                results.append({"row": index, "username": user.username, "status": "error", "error": "User already exists"})
+        conn.commit()
+        conn.close()
+
+        return results
+
+    @staticmethod
+    async def run(rows: List[dict]) -> AsyncIterator[dict]:
+        """Validate, hash and insert rows, yielding one result per row and a final summary.
+
+        Passwords are hashed across a process pool a batch at a time, and
+        each batch is inserted in a single transaction as soon as it is hashed.
+        """
+        valid, errors = await asyncio.to_thread(UserImportService.validate, rows)
+        for error in errors:
+            yield error
+
+        created = 0
+        if valid:
+            loop = asyncio.get_running_loop()
+            pool = ProcessPoolExecutor(
+                max_workers=min(USER_IMPORT_WORKERS, len(valid)),
+                mp_context=multiprocessing.get_context('spawn')
+            )
+            try:
+                for start in range(0, len(valid), USER_IMPORT_BATCH_SIZE):
+                    chunk = valid[start:start + USER_IMPORT_BATCH_SIZE]
+                    hashes = await asyncio.gather(*(
+                        loop.run_in_executor(pool, get_password_hash, user.password) for _, user in chunk
+                    ))
+                    batch = [(index, user, password_hash) for (index, user), password_hash in zip(chunk, hashes)]
+                    for result in await asyncio.to_thread(UserImportService.insert_batch, batch):
+                        if result['status'] == 'created':
+                            created += 1
+                        yield result
+            finally:
+                pool.shutdown(wait=False, cancel_futures=True)
+
+        yield {"summary": {"total": len(rows), "created": created, "failed": len(rows) - created}}
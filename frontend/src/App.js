@@ -511,6 +511,11 @@ const Dashboard = ({ user, onLogout }) => {
   }, [darkMode, themeMode]);
 
   const handleLogout = () => {
+    // Revoke the token server-side without waiting for the response
+    const token = localStorage.getItem('token');
+    if (token) {
+      api.post('/auth/logout', null, { headers: { Authorization: `Bearer ${token}` } }).catch(() => {});
+    }
     localStorage.removeItem('token');
     localStorage.removeItem('user');
     onLogout();
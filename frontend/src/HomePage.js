@@ -131,9 +131,22 @@ const OnlineUsersCard = ({ enabled }) => {
       }
     };
 
+    // Presence changes are pushed over the chat socket; polling is only a fallback
+    const applyDiff = (event) => {
+      const { online = [], offline = [] } = event.detail;
+      setOnlineUsers(prev => {
+        const gone = new Set([...offline, ...online.map(u => u.id)]);
+        return [...prev.filter(u => !gone.has(u.id)), ...online];
+      });
+    };
+
     loadOnlineUsers();
-    const interval = setInterval(loadOnlineUsers, 30000);
-    return () => clearInterval(interval);
+    window.addEventListener('peon:presence-diff', applyDiff);
+    const interval = setInterval(loadOnlineUsers, 120000);
+    return () => {
+      clearInterval(interval);
+      window.removeEventListener('peon:presence-diff', applyDiff);
+    };
   }, [enabled]);
 
   if (!enabled) return null;
@@ -254,7 +267,10 @@ const CommunityChat = ({ user, enabled, canModerate }) => {
         ws.onmessage = (event) => {
           try {
             const data = JSON.parse(event.data);
-            if (data.type === 'chat_history') {
+            if (data.type === 'ping') {
+              // Server liveness check; unanswered pings close the socket
+              ws.send(JSON.stringify({ type: 'pong' }));
+            } else if (data.type === 'chat_history') {
               setMessages(data.messages);
               setTimeout(scrollToBottom, 100);
             } else if (data.type === 'chat_message') {
@@ -264,15 +280,26 @@ const CommunityChat = ({ user, enabled, canModerate }) => {
               setMessages(prev => prev.filter(m => m.id !== data.message_id));
             } else if (data.type === 'chat_cleared') {
               setMessages([]);
+            } else if (data.type === 'user_messages_deleted') {
+              setMessages(prev => prev.filter(m => m.user_id !== data.user_id));
+            } else if (data.type === 'user_renamed') {
+              setMessages(prev => prev.map(m => (m.user_id === data.user_id ? { ...m, username: data.username } : m)));
+            } else if (data.type === 'presence_diff') {
+              window.dispatchEvent(new CustomEvent('peon:presence-diff', { detail: data }));
             }
           } catch (e) {
             console.error('Failed to parse WebSocket message:', e);
           }
         };
         
-        ws.onclose = () => {
+        ws.onclose = (event) => {
           setWsConnected(false);
-          setTimeout(connectWebSocket, 3000);
+          if (event.code === 4000) {
+            // Closed for idling: reconnect once the user is back
+            window.addEventListener('focus', connectWebSocket, { once: true });
+          } else {
+            setTimeout(connectWebSocket, 3000);
+          }
         };
         
         ws.onerror = () => {
@@ -292,6 +319,7 @@ const CommunityChat = ({ user, enabled, canModerate }) => {
     connectWebSocket();
 
     return () => {
+      window.removeEventListener('focus', connectWebSocket);
       if (wsRef.current) {
         wsRef.current.close();
       }
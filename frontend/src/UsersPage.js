@@ -7,6 +7,8 @@ import {
 import { api } from './utils/api';
 import { LoadingSpinner } from './components/common/Loading';
 
+const USERS_PAGE_SIZE = 60;
+
 // User Card Component
 const UserCard = ({ user, currentUser, orchestrators, onEdit, onDelete, onResetPassword, onLink, onUnlink, onBan, onUnban }) => {
   const [showLinks, setShowLinks] = useState(false);
@@ -451,15 +453,26 @@ export const UsersPage = ({ orchestrators, currentUser }) => {
   const [resetPasswordUser, setResetPasswordUser] = useState(null);
   const [linkingUser, setLinkingUser] = useState(null);
   const [searchTerm, setSearchTerm] = useState('');
+  const [total, setTotal] = useState(0);
+  const [roleCounts, setRoleCounts] = useState({});
+  const [loadingMore, setLoadingMore] = useState(false);
 
+  // Search runs server-side; debounce so typing does not fire a request per key
   useEffect(() => {
-    loadUsers();
-  }, []);
+    const timeout = setTimeout(() => loadUsers(), 300);
+    return () => clearTimeout(timeout);
+  }, [searchTerm]);
+
+  const fetchUsersPage = (offset) => api.get('/admin/users', {
+    params: { search: searchTerm || undefined, limit: USERS_PAGE_SIZE, offset }
+  });
 
   const loadUsers = async () => {
     try {
-      const response = await api.get('/admin/users');
+      const [response, stats] = await Promise.all([fetchUsersPage(0), api.get('/admin/users/stats')]);
       setUsers(response.data);
+      setTotal(Number(response.headers['x-total-count'] ?? response.data.length));
+      setRoleCounts(stats.data);
     } catch (err) {
       console.error('Failed to load users:', err);
     } finally {
@@ -467,6 +480,19 @@ export const UsersPage = ({ orchestrators, currentUser }) => {
     }
   };
 
+  const loadMoreUsers = async () => {
+    setLoadingMore(true);
+    try {
+      const response = await fetchUsersPage(users.length);
+      setUsers(prev => [...prev, ...response.data]);
+      setTotal(Number(response.headers['x-total-count'] ?? total));
+    } catch (err) {
+      console.error('Failed to load users:', err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleSaveUser = async (formData, userId) => {
     if (userId) {
       await api.put(`/admin/users/${userId}`, formData);
@@ -525,11 +551,6 @@ export const UsersPage = ({ orchestrators, currentUser }) => {
     }
   };
 
-  const filteredUsers = users.filter(user =>
-    user.username.toLowerCase().includes(searchTerm.toLowerCase()) ||
-    user.email.toLowerCase().includes(searchTerm.toLowerCase())
-  );
-
   return (
     <div className="space-y-6">
       {/* Header */}
@@ -561,15 +582,15 @@ export const UsersPage = ({ orchestrators, currentUser }) => {
       {/* User Stats */}
       <div className="grid grid-cols-3 gap-4">
         <div className="stat-card">
-          <div className="stat-value text-sky-400">{users.length}</div>
+          <div className="stat-value text-sky-400">{roleCounts.total ?? 0}</div>
           <div className="stat-label">Total Users</div>
         </div>
         <div className="stat-card">
-          <div className="stat-value text-red-400">{users.filter(u => u.role === 'admin').length}</div>
+          <div className="stat-value text-red-400">{roleCounts.by_role?.admin ?? 0}</div>
           <div className="stat-label">Admins</div>
         </div>
         <div className="stat-card">
-          <div className="stat-value text-blue-400">{users.filter(u => u.role === 'moderator').length}</div>
+          <div className="stat-value text-blue-400">{roleCounts.by_role?.moderator ?? 0}</div>
           <div className="stat-label">Moderators</div>
         </div>
       </div>
@@ -579,7 +600,7 @@ export const UsersPage = ({ orchestrators, currentUser }) => {
         <div className="flex justify-center py-12">
           <LoadingSpinner size="lg" />
         </div>
-      ) : filteredUsers.length === 0 ? (
+      ) : users.length === 0 ? (
         <div className="text-center py-12 stone-texture rounded-lg">
           <Users className="w-16 h-16 mx-auto mb-4 opacity-50" />
           <h3 className="warcraft-subtitle text-xl mb-2">No Users Found</h3>
@@ -587,7 +608,7 @@ export const UsersPage = ({ orchestrators, currentUser }) => {
         </div>
       ) : (
         <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-4">
-          {filteredUsers.map((user) => (
+          {users.map((user) => (
             <UserCard
               key={user.id}
               user={user}
@@ -605,6 +626,19 @@ export const UsersPage = ({ orchestrators, currentUser }) => {
         </div>
       )}
 
+      {!loading && users.length < total && (
+        <div className="flex justify-center">
+          <button
+            onClick={loadMoreUsers}
+            disabled={loadingMore}
+            className="px-4 py-2 rounded border border-gray-700 text-sm flex items-center gap-2"
+          >
+            {loadingMore && <Loader2 className="w-4 h-4 animate-spin" />}
+            Load more ({total - users.length} remaining)
+          </button>
+        </div>
+      )}
+
       {/* Modals */}
       {(showCreateModal || editingUser) && (
         <UserModal
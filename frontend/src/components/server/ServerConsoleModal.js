@@ -64,7 +64,10 @@ export const ServerConsoleModal = ({ server, orchestratorId, onClose }) => {
         try {
           const data = JSON.parse(event.data);
           
-          if (data.type === 'connected') {
+          if (data.type === 'ping') {
+            // Server liveness check; unanswered pings close the socket
+            ws.send(JSON.stringify({ type: 'pong' }));
+          } else if (data.type === 'connected') {
             // Initial connection message
             setLogs(prev => [...prev, {
               id: `sys-${Date.now()}`,
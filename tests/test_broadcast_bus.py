@@ -0,0 +1,83 @@
+"""
+Broadcast Bus Tests
+Tests for: SQLite bus fan-out between workers sharing one database, cross-worker invalidations
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from core import database  # noqa: E402
+from core.bus import SQLiteBus  # noqa: E402
+from core.invalidation import invalidations  # noqa: E402
+from core.websocket import ConnectionManager  # noqa: E402
+
+POLL_INTERVAL = 0.05
+
+
+@pytest.fixture
+def shared_db(tmp_path, monkeypatch):
+    """Point both 'workers' at one fresh database"""
+    monkeypatch.setattr(database, "DB_PATH", tmp_path / "bus.db")
+    database.init_db()
+
+
+async def wait_for(condition, timeout=5.0):
+    """Poll until condition() is true"""
+    async with asyncio.timeout(timeout):
+        while not condition():
+            await asyncio.sleep(POLL_INTERVAL)
+
+
+class TestSQLiteBus:
+    """Two SQLiteBus instances standing in for two workers"""
+
+    def test_envelopes_reach_the_other_worker(self, shared_db):
+        """Test an envelope is delivered once locally and once on the other worker"""
+        async def scenario():
+            first, second = SQLiteBus(poll_interval=POLL_INTERVAL), SQLiteBus(poll_interval=POLL_INTERVAL)
+            first_seen, second_seen = [], []
+            first.bind(first_seen.append)
+            second.bind(second_seen.append)
+            await first.start()
+            await second.start()
+            try:
+                first.publish({"type": "broadcast", "message": {"type": "ping", "n": 1}})
+                await wait_for(lambda: second_seen)
+                # Give the publisher a few polls to (wrongly) see its own row again
+                await asyncio.sleep(POLL_INTERVAL * 4)
+            finally:
+                await first.stop()
+                await second.stop()
+            return first, first_seen, second_seen
+
+        first, first_seen, second_seen = asyncio.run(scenario())
+        assert [e["message"]["n"] for e in first_seen] == [1]
+        assert [e["message"]["n"] for e in second_seen] == [1]
+        assert second_seen[0]["origin"] == first.origin
+
+    def test_invalidations_apply_on_every_worker(self, shared_db):
+        """Test an invalidation announced by one worker is applied by the other"""
+        applied = []
+        invalidations.register("test_cache", applied.append)
+
+        async def scenario():
+            first = ConnectionManager(SQLiteBus(poll_interval=POLL_INTERVAL))
+            second = ConnectionManager(SQLiteBus(poll_interval=POLL_INTERVAL))
+            await second.start()
+            # The first worker started last, so it publishes the invalidation
+            await first.start()
+            try:
+                invalidations.invalidate("test_cache", "user-1")
+                await wait_for(lambda: len(applied) == 2)
+                await asyncio.sleep(POLL_INTERVAL * 4)
+            finally:
+                await first.stop()
+                await second.stop()
+
+        asyncio.run(scenario())
+        # Once here, once when the other worker polled the envelope
+        assert applied == ["user-1", "user-1"]
@@ -6,6 +6,7 @@ import pytest
 import requests
 import os
 import time
+import uuid
 
 BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', 'http://localhost:8001').rstrip('/')
 
@@ -40,6 +41,37 @@ class TestAuthentication:
         })
         assert response.status_code == 401
         print("✓ Invalid credentials correctly rejected")
+
+    def test_login_throttled_after_repeated_failures(self):
+        """Test repeated failed logins for one username are throttled with 429"""
+        username = f"throttle_{int(time.time() * 1000)}"
+        statuses = []
+        for _ in range(15):
+            response = requests.post(f"{BASE_URL}/api/auth/login", json={
+                "username": username,
+                "password": "wrongpass"
+            })
+            statuses.append(response.status_code)
+            if response.status_code == 429:
+                break
+
+        assert statuses[0] == 401
+        assert statuses[-1] == 429, statuses
+        assert int(response.headers["Retry-After"]) >= 1
+
+        # Throttled attempts are exported as metrics
+        login_response = requests.post(f"{BASE_URL}/api/auth/login", json={
+            "username": TEST_USERNAME,
+            "password": TEST_PASSWORD
+        })
+        token = login_response.json()["access_token"]
+        metrics_response = requests.get(
+            f"{BASE_URL}/api/admin/metrics",
+            headers={"Authorization": f"Bearer {token}"}
+        )
+        assert metrics_response.status_code == 200
+        assert metrics_response.json()["counters"]["login_throttled_user"] >= 1
+        print(f"✓ Login throttled after {len(statuses) - 1} failed attempts")
     
     def test_get_current_user(self):
         """Test getting current user info"""
@@ -298,6 +330,246 @@ class TestAuditLog:
         # Should have at least login entries
         assert len(data["logs"]) > 0
         print(f"✓ Audit log has {len(data['logs'])} entries")
+    
+    def test_audit_log_cursor_pagination(self, auth_token):
+        """Test walking the audit log forwards and backwards with cursors"""
+        headers = {"Authorization": f"Bearer {auth_token}"}
+        first = requests.get(f"{BASE_URL}/api/admin/audit-log?limit=1", headers=headers).json()
+        assert first["next_cursor"], "Expected more than one audit entry"
+        assert first["prev_cursor"] is None
+        
+        second = requests.get(
+            f"{BASE_URL}/api/admin/audit-log",
+            params={"limit": 1, "cursor": first["next_cursor"]},
+            headers=headers
+        ).json()
+        assert second["logs"][0]["id"] != first["logs"][0]["id"]
+        assert second["prev_cursor"]
+        
+        back = requests.get(
+            f"{BASE_URL}/api/admin/audit-log",
+            params={"limit": 1, "cursor": second["prev_cursor"], "direction": "prev"},
+            headers=headers
+        ).json()
+        assert back["logs"][0]["id"] == first["logs"][0]["id"]
+        print("✓ Audit log cursor pagination works in both directions")
+    
+    def test_audit_log_summary(self, auth_token):
+        """Test the counter-backed audit summary"""
+        response = requests.get(
+            f"{BASE_URL}/api/admin/audit-log/summary?days=7",
+            headers={"Authorization": f"Bearer {auth_token}"}
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["counts"].get("auth", 0) > 0
+        assert sum(d["count"] for d in data["daily"] if d["category"] == "auth") == data["counts"]["auth"]
+        print(f"✓ Audit summary: {data['total']} total entries")
+    
+    def test_audit_counters_consistent(self, auth_token):
+        """Test that maintained counters match the audit log"""
+        response = requests.post(
+            f"{BASE_URL}/api/admin/audit-log/counters/rebuild?dry_run=true",
+            headers={"Authorization": f"Bearer {auth_token}"}
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["consistent"], f"Counter drift: {data['drift']}"
+    
+    def test_audit_log_invalid_cursor(self, auth_token):
+        """Test that a malformed cursor is rejected"""
+        response = requests.get(
+            f"{BASE_URL}/api/admin/audit-log?cursor=not-a-cursor",
+            headers={"Authorization": f"Bearer {auth_token}"}
+        )
+        assert response.status_code == 400
+
+
+class TestDataRetention:
+    """Retention policy and database stats tests"""
+    
+    @pytest.fixture
+    def auth_token(self):
+        """Get authentication token"""
+        response = requests.post(f"{BASE_URL}/api/auth/login", json={
+            "username": TEST_USERNAME,
+            "password": TEST_PASSWORD
+        })
+        return response.json()["access_token"]
+    
+    def test_get_retention_policies(self, auth_token):
+        """Test getting retention policies"""
+        response = requests.get(
+            f"{BASE_URL}/api/admin/retention",
+            headers={"Authorization": f"Bearer {auth_token}"}
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert "chat_messages" in data
+        assert "audit_log" in data
+        print(f"✓ Retention policies retrieved: {data}")
+    
+    def test_run_retention(self, auth_token):
+        """Test running retention on demand"""
+        response = requests.post(
+            f"{BASE_URL}/api/admin/retention/run",
+            headers={"Authorization": f"Bearer {auth_token}"}
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert "results" in data
+        assert "pages_released" in data
+        print(f"✓ Retention run: {data}")
+    
+    def test_get_database_stats(self, auth_token):
+        """Test getting table sizes"""
+        response = requests.get(
+            f"{BASE_URL}/api/admin/database/stats",
+            headers={"Authorization": f"Bearer {auth_token}"}
+        )
+        assert response.status_code == 200
+        data = response.json()
+        tables = {t["table"]: t for t in data["tables"]}
+        assert "chat_messages" in tables
+        assert "audit_log" in tables
+        print(f"✓ Database stats: {data['page_count']} pages")
+    
+    def test_enable_incremental_vacuum(self, auth_token):
+        """Test the one-time vacuum leaves the database in incremental mode"""
+        headers = {"Authorization": f"Bearer {auth_token}"}
+        response = requests.post(f"{BASE_URL}/api/admin/database/vacuum", headers=headers)
+        assert response.status_code == 200
+        assert response.json()["enabled"] is True
+        
+        stats = requests.get(f"{BASE_URL}/api/admin/database/stats", headers=headers).json()
+        assert stats["incremental_vacuum"] is True
+
+
+class TestChatHistory:
+    """Chat history pagination tests"""
+    
+    @pytest.fixture
+    def auth_token(self):
+        """Get authentication token"""
+        response = requests.post(f"{BASE_URL}/api/auth/login", json={
+            "username": TEST_USERNAME,
+            "password": TEST_PASSWORD
+        })
+        return response.json()["access_token"]
+    
+    def test_chat_history_pages(self, auth_token):
+        """Test paging back through chat history with cursors"""
+        headers = {"Authorization": f"Bearer {auth_token}"}
+        sent = []
+        for i in range(3):
+            response = requests.post(
+                f"{BASE_URL}/api/chat/messages",
+                params={"message": f"history test {i}"},
+                headers=headers
+            )
+            assert response.status_code == 200
+            sent.append(response.json()["id"])
+        
+        latest = requests.get(f"{BASE_URL}/api/chat/history?limit=2", headers=headers).json()
+        assert [m["id"] for m in latest["messages"]] == sent[1:]
+        assert latest["next_cursor"]
+        
+        older = requests.get(
+            f"{BASE_URL}/api/chat/history",
+            params={"limit": 2, "cursor": latest["next_cursor"]},
+            headers=headers
+        ).json()
+        assert older["messages"][-1]["id"] == sent[0]
+        print("✓ Chat history paged back in time")
+    
+    def test_chat_history_reflects_deletes(self, auth_token):
+        """Test recent history drops deleted messages and a user's deleted history"""
+        headers = {"Authorization": f"Bearer {auth_token}"}
+        kept = requests.post(f"{BASE_URL}/api/chat/messages", params={"message": "keep me"}, headers=headers).json()
+        removed = requests.post(f"{BASE_URL}/api/chat/messages", params={"message": "delete me"}, headers=headers).json()
+        
+        response = requests.delete(f"{BASE_URL}/api/chat/messages/{removed['id']}", headers=headers)
+        assert response.status_code == 200
+        
+        recent = [m["id"] for m in requests.get(f"{BASE_URL}/api/chat/messages?limit=5", headers=headers).json()]
+        assert kept["id"] in recent
+        assert removed["id"] not in recent
+        
+        response = requests.delete(f"{BASE_URL}/api/admin/users/{kept['user_id']}/chat-history", headers=headers)
+        assert response.status_code == 200
+        latest = requests.get(f"{BASE_URL}/api/chat/history?limit=5", headers=headers).json()
+        assert all(m["user_id"] != kept["user_id"] for m in latest["messages"])
+        print("✓ Chat history reflects deletions")
+    
+    def test_online_users(self, auth_token):
+        """Test online users are listed with usernames and roles"""
+        headers = {"Authorization": f"Bearer {auth_token}"}
+        response = requests.get(f"{BASE_URL}/api/chat/online", headers=headers)
+        assert response.status_code == 200
+        users = response.json()
+        assert isinstance(users, list)
+        assert all({"id", "username", "role"} <= set(user) for user in users)
+        print(f"✓ {len(users)} user(s) online")
+    
+    def test_session_channel(self, auth_token):
+        """Test messages posted to a session channel stay out of global chat"""
+        headers = {"Authorization": f"Bearer {auth_token}"}
+        session = requests.post(f"{BASE_URL}/api/sessions", json={
+            "title": "Channel test",
+            "orchestrator_id": "channel-test-orch",
+            "scheduled_time": "2030-01-01T20:00:00Z"
+        }, headers=headers).json()
+        channel = f"session:{session['id']}"
+        
+        try:
+            response = requests.post(
+                f"{BASE_URL}/api/chat/messages",
+                params={"message": "session only", "channel": channel},
+                headers=headers
+            )
+            assert response.status_code == 200
+            posted = response.json()
+            assert posted["channel"] == channel
+            
+            in_channel = requests.get(f"{BASE_URL}/api/chat/messages", params={"channel": channel}, headers=headers).json()
+            assert [m["id"] for m in in_channel] == [posted["id"]]
+            in_global = requests.get(f"{BASE_URL}/api/chat/messages?limit=200", headers=headers).json()
+            assert posted["id"] not in [m["id"] for m in in_global]
+            
+            response = requests.get(f"{BASE_URL}/api/chat/messages", params={"channel": "session:missing"}, headers=headers)
+            assert response.status_code == 403
+        finally:
+            requests.delete(f"{BASE_URL}/api/sessions/{session['id']}", headers=headers)
+        print("✓ Session channel is scoped")
+    
+    def test_chat_search(self, auth_token):
+        """Test full-text search finds messages and follows deletions"""
+        headers = {"Authorization": f"Bearer {auth_token}"}
+        word = f"needle{uuid.uuid4().hex[:8]}"
+        posted = [
+            requests.post(f"{BASE_URL}/api/chat/messages", params={"message": f"{word} number {i}"}, headers=headers).json()
+            for i in range(3)
+        ]
+        
+        first = requests.get(f"{BASE_URL}/api/chat/search", params={"q": word, "limit": 2}, headers=headers).json()
+        assert len(first["messages"]) == 2
+        assert first["next_cursor"]
+        rest = requests.get(
+            f"{BASE_URL}/api/chat/search",
+            params={"q": word, "limit": 2, "cursor": first["next_cursor"]},
+            headers=headers
+        ).json()
+        found = {m["id"] for m in first["messages"] + rest["messages"]}
+        assert found == {m["id"] for m in posted}
+        
+        requests.delete(f"{BASE_URL}/api/chat/messages/{posted[0]['id']}", headers=headers)
+        recent = requests.get(
+            f"{BASE_URL}/api/chat/search",
+            params={"q": word, "sort": "recent", "user_id": posted[0]["user_id"]},
+            headers=headers
+        ).json()
+        assert [m["id"] for m in recent["messages"]] == [posted[2]["id"], posted[1]["id"]]
+        print("✓ Chat search found and paged messages")
 
 
 class TestOrchestrators:
@@ -323,6 +595,24 @@ class TestOrchestrators:
         assert isinstance(data, list)
         print(f"✓ Orchestrators retrieved: {len(data)} orchestrators")
         return data
+    
+    def test_search_servers(self, auth_token):
+        """Test searching cached servers by indexed fields"""
+        response = requests.get(
+            f"{BASE_URL}/api/servers/search",
+            params={"game": "valheim", "state": "running"},
+            headers={"Authorization": f"Bearer {auth_token}"}
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert isinstance(data, list)
+        assert all(s["game_uid"] == "valheim" and s["container_state"] == "running" for s in data)
+        print(f"✓ Server search returned {len(data)} servers")
+    
+    def test_search_servers_requires_auth(self):
+        """Test server search requires authentication"""
+        response = requests.get(f"{BASE_URL}/api/servers/search")
+        assert response.status_code in [401, 403]
 
 
 class TestSystemFeatures: